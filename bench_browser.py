@@ -0,0 +1,60 @@
+import sys
+import time
+import logging
+import statistics
+import fb_bot
+from fb_bot import FacebookMessenger, CHAT_URL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def measure(lean, rounds):
+    """Launch the bot's browser in lean or full mode and sample chat page loads."""
+    fb_bot.LEAN_BROWSER = lean
+    messenger = FacebookMessenger()
+    samples = []
+
+    try:
+        if not messenger.browser.call(messenger.login):
+            logger.error("Failed to log in")
+            return None
+
+        for _ in range(rounds):
+            started = time.perf_counter()
+            messenger.browser.call(messenger.navigate_to_chat)
+            elapsed = time.perf_counter() - started
+            metrics = messenger.browser.call(messenger.page_metrics)
+            metrics['ready_s'] = elapsed
+            samples.append(metrics)
+    finally:
+        messenger.close()
+
+    def median(key):
+        values = [sample[key] for sample in samples if sample.get(key) is not None]
+        return statistics.median(values) if values else None
+
+    return {
+        'startup_s': messenger.startup_seconds,
+        'ready_s': median('ready_s'),
+        'load_ms': median('load_ms'),
+        'transfer_kb': (median('transfer_bytes') or 0) / 1024,
+        'js_heap_mb': (median('js_heap_bytes') or 0) / 1048576,
+    }
+
+def main():
+    """Compare chat load time, bytes and JS heap with and without lean mode."""
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = {}
+    for lean in (False, True):
+        results['lean' if lean else 'full'] = measure(lean, rounds)
+
+    for mode, result in results.items():
+        if result:
+            logger.info(
+                f"{mode:>4}: startup {result['startup_s']:.1f}s, chat ready {result['ready_s']:.2f}s, "
+                f"load {result['load_ms']}ms, {result['transfer_kb']:.0f}KB transferred, "
+                f"JS heap {result['js_heap_mb']:.0f}MB"
+            )
+
+if __name__ == "__main__":
+    main()
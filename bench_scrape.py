@@ -0,0 +1,29 @@
+import logging
+from fb_bot import FacebookMessenger
+from config import FB_GC_ID
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Log in, open the group chat and compare per-row vs bulk scrape times."""
+    fb_bot = FacebookMessenger()
+
+    if not fb_bot.browser.call(fb_bot.login):
+        logger.error("Failed to initialize Facebook bot")
+        return
+
+    try:
+        fb_bot.browser.call(fb_bot.driver.get, f"https://www.facebook.com/messages/t/{FB_GC_ID}")
+        fb_bot.browser.call(fb_bot.scan_message_rows, 20)  # Warm up: wait for the rows to render
+        results = fb_bot.browser.call(fb_bot.benchmark_scrape, 20, 5)
+
+        per_row = results['per_row']['mean']
+        bulk = results['bulk']['mean']
+        if bulk:
+            logger.info(f"Bulk extraction is {per_row / bulk:.1f}x faster than the per-row scan")
+    finally:
+        fb_bot.close()
+
+if __name__ == "__main__":
+    main()
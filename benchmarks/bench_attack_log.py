@@ -0,0 +1,48 @@
+# bench_attack_log.py
+import itertools
+
+import war_log
+from conftest import make_war_payload, monitor_for
+
+
+def bench_attack_dedup(benchmark, attack_history_dir, loop, monkeypatch):
+    """main's diff step: which of the latest attacks of a 50v50 war are not logged yet"""
+    monkeypatch.chdir(attack_history_dir)
+    attacks = loop.run_until_complete(monitor_for(make_war_payload(50)).get_recent_attacks(count=100))
+    war_id = war_log.get_or_create_war('Dedup Opponent', 'war-dedup', 50)
+    for attack in attacks[50:]:
+        war_log.log_attack(war_id, attack['order'], attack['attacker_tag'], attack['attacker'],
+                           attack['defender_name'], attack['stars'], attack['destruction'])
+
+    new_attacks = benchmark(lambda: [a for a in attacks if not war_log.is_attack_logged(war_id, a['order'])])
+    assert len(new_attacks) == 50
+
+
+def bench_log_attack(benchmark, attack_history_dir, monkeypatch):
+    """One committed insert per attack, as the attack poll does"""
+    monkeypatch.chdir(attack_history_dir)
+    war_id = war_log.get_or_create_war('Insert Opponent', 'war-insert', 50)
+    orders = itertools.count(1)
+    benchmark(lambda: war_log.log_attack(war_id, next(orders), '#clan001QRV', 'clan-player-1',
+                                         'opponent-player-1', 3, 100))
+    assert len(war_log.get_war_attacks(war_id)) == next(orders) - 1
+
+
+def bench_attack_table_1m(benchmark, attack_table_dir, monkeypatch):
+    """manage_war's unfiltered table load"""
+    monkeypatch.chdir(attack_table_dir)
+    columns, rows = benchmark.pedantic(war_log.get_attack_table, rounds=3, iterations=1)
+    assert len(rows) == 1_000_000 and columns[:2] == ['war_id', 'opponent_clan']
+
+
+def bench_attack_table_1m_filtered(benchmark, attack_table_dir, monkeypatch):
+    """manage_war's search box: LIKE over attacker tag/name and defender name"""
+    monkeypatch.chdir(attack_table_dir)
+    columns, rows = benchmark.pedantic(war_log.get_attack_table, args=('clan-player-7',), rounds=3, iterations=1)
+    assert rows
+
+
+def bench_player_history_1m(benchmark, attack_table_dir, monkeypatch):
+    monkeypatch.chdir(attack_table_dir)
+    rows = benchmark(war_log.get_player_history, '#clan007QRV')
+    assert len(rows) == 50
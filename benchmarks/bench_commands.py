@@ -0,0 +1,21 @@
+# bench_commands.py
+import pytest
+
+from commands import registry
+
+COMMANDS = {
+    'status': "!status",
+    'help': "!help",
+    'unknown': "!nosuchcommand",
+    'usage_error': "!warstatus everything",
+    'kudos_leaderboard': "!kudos weekly 5",
+    'kudos_range': "!kudos 2025-01-01 2025-03-31",
+    'kudos_award': "!kudos Some Player",
+    'warstatus': "!warstatus top",
+}
+
+
+@pytest.mark.parametrize('name', COMMANDS)
+def bench_dispatch(benchmark, command_bot, name):
+    reply = benchmark(registry.dispatch, command_bot, COMMANDS[name], 'bench')
+    assert reply
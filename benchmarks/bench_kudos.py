@@ -0,0 +1,22 @@
+# bench_kudos.py
+import pytest
+
+import kudos_ledger
+
+
+@pytest.mark.parametrize('period', ('total',) + kudos_ledger.PERIODS)
+def bench_get_kudos_leaderboard_100k(benchmark, kudos_bot, period):
+    rows = benchmark(kudos_bot.get_kudos_leaderboard, period, 10)
+    assert len(rows) == 10
+
+
+def bench_get_kudos_leaderboard_100k_range(benchmark, kudos_bot):
+    """A 90-day custom range, as !kudos YYYY-MM-DD YYYY-MM-DD asks for"""
+    today = kudos_ledger.local_day()
+    rows = benchmark(kudos_bot.get_kudos_leaderboard, 'range', 10, (today - 90, today + 1))
+    assert len(rows) == 10
+
+
+def bench_give_kudos(benchmark, kudos_write_bot):
+    """Award write: kudos row, ledger entry and both buckets in one transaction"""
+    assert benchmark(kudos_write_bot.give_kudos, 'player-42', giver='bench')
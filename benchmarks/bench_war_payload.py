@@ -0,0 +1,34 @@
+# bench_war_payload.py
+import json
+
+import pytest
+
+from conftest import TEAM_SIZES, make_war_payload, monitor_for
+
+
+@pytest.mark.parametrize('team_size', TEAM_SIZES)
+def bench_decode_war_payload(benchmark, team_size):
+    """What response.json() pays for one /currentwar poll"""
+    raw = json.dumps(make_war_payload(team_size)).encode()
+    war = benchmark(json.loads, raw)
+    assert len(war['clan']['members']) == team_size
+
+
+@pytest.mark.parametrize('team_size', TEAM_SIZES)
+def bench_render_war_views(benchmark, team_size):
+    monitor = monitor_for(None)
+    views = benchmark(monitor.render_war_views, make_war_payload(team_size))
+    assert f"({team_size}v{team_size})" in views['summary']
+
+
+def bench_get_recent_attacks_50v50(benchmark, loop):
+    monitor = monitor_for(make_war_payload(50))
+    attacks = benchmark(lambda: loop.run_until_complete(monitor.get_recent_attacks(count=3)))
+    orders = [attack['order'] for attack in attacks]
+    assert len(orders) == 3 and orders == sorted(orders, reverse=True)
+
+
+def bench_get_war_results_50v50(benchmark, loop):
+    monitor = monitor_for(make_war_payload(50, state='warEnded'))
+    results = benchmark(lambda: loop.run_until_complete(monitor.get_war_results('#CLAN')))
+    assert len(results['clan']['top_attackers']) == 3
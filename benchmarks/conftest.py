@@ -0,0 +1,218 @@
+# conftest.py
+"""Synthetic wars, attack logs and kudos ledgers for the benchmarks.
+
+Datasets are built once per session in temporary directories. The bot opens
+its databases by relative path (fb_messages.db, war_attacks.db), so each
+benchmark changes into the directory of the dataset it reads.
+"""
+import asyncio
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+import kudos_ledger
+from coc_monitor import CocMonitor
+from fb_bot import FacebookMessenger
+from war_log import init_attack_log_db
+
+TEAM_SIZES = (5, 15, 50)
+ATTACKS_PER_MEMBER = 2
+
+
+def pytest_configure(config):
+    """The first run on a machine has nothing to compare against, so it saves the baseline"""
+    storage = str(config.getoption('benchmark_storage'))
+    if storage.startswith('file://'):
+        storage = storage[len('file://'):]
+    if config.getoption('benchmark_compare') and not any(Path(storage).glob('*/*.json')):
+        config.option.benchmark_compare = None
+        config.option.benchmark_compare_fail = None
+        config.option.benchmark_save = config.option.benchmark_save or 'baseline'
+
+
+def war_tag(side, position):
+    return f"#{side}{position:03d}QRV"
+
+
+def make_members(side, team_size, opponent_side, attacks_per_member, rng):
+    members = []
+    for position in range(1, team_size + 1):
+        attacks = [{
+            'attackerTag': war_tag(side, position),
+            'defenderTag': war_tag(opponent_side, rng.randint(1, team_size)),
+            'stars': rng.randint(0, 3),
+            'destructionPercentage': rng.randint(0, 100),
+            'order': None,
+            'duration': rng.randint(30, 180),
+        } for _ in range(attacks_per_member)]
+        members.append({
+            'tag': war_tag(side, position),
+            'name': f"{side}-player-{position}",
+            'townhallLevel': rng.randint(9, 16),
+            'mapPosition': position,
+            'attacks': attacks,
+            'opponentAttacks': attacks_per_member,
+        })
+    return members
+
+
+def make_war_payload(team_size, state='inWar', attacks_per_member=ATTACKS_PER_MEMBER, seed=0):
+    """A /currentwar response with every attack used, shaped like the live API's"""
+    rng = random.Random(seed)
+    sides = {}
+    for side, opponent_side in (('clan', 'opponent'), ('opponent', 'clan')):
+        members = make_members(side, team_size, opponent_side, attacks_per_member, rng)
+        sides[side] = {
+            'tag': war_tag(side, 0),
+            'name': f"{side.capitalize()} Clan",
+            'badgeUrls': {'small': f"https://api-assets.clashofclans.com/badges/70/{side}.png"},
+            'clanLevel': 20,
+            'attacks': team_size * attacks_per_member,
+            'stars': sum(a['stars'] for m in members for a in m['attacks']),
+            'destructionPercentage': round(rng.uniform(50, 100), 2),
+            'members': members,
+        }
+    # Both clans' attacks share one war-wide order sequence
+    attacks = [a for side in sides.values() for m in side['members'] for a in m['attacks']]
+    rng.shuffle(attacks)
+    for order, attack in enumerate(attacks, 1):
+        attack['order'] = order
+
+    return {
+        'state': state,
+        'teamSize': team_size,
+        'attacksPerMember': attacks_per_member,
+        'preparationStartTime': '20250101T000000.000Z',
+        'startTime': '20250102T000000.000Z',
+        'endTime': '20250103T000000.000Z',
+        'clan': sides['clan'],
+        'opponent': sides['opponent'],
+    }
+
+
+def monitor_for(payload):
+    """CocMonitor whose API calls return payload instead of going to the network"""
+    monitor = CocMonitor()
+
+    async def fetch_data(session, endpoint):
+        return payload
+
+    monitor.fetch_data = fetch_data
+    return monitor
+
+
+def fill_attack_log(directory, wars, attacks_per_war, seed=0):
+    """war_attacks.db with wars x attacks_per_war rows drawn from a 50-member roster"""
+    rng = random.Random(seed)
+    db_name = str(directory / 'war_attacks.db')
+    init_attack_log_db(db_name)
+    conn = sqlite3.connect(db_name)
+    conn.executemany(
+        'INSERT INTO wars (war_id, opponent_clan, start_time, team_size) VALUES (?, ?, ?, ?)',
+        ((war_id, f"Opponent {war_id % 500}", f"war-{war_id:06d}", 50) for war_id in range(1, wars + 1))
+    )
+    conn.executemany(
+        '''
+        INSERT INTO attacks
+            (war_id, attack_order, attacker_tag, attacker_name, defender_name, stars, destruction_percentage)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''',
+        (
+            (war_id, order, war_tag('clan', order % 50 + 1), f"clan-player-{order % 50 + 1}",
+             f"opponent-player-{rng.randint(1, 50)}", rng.randint(0, 3), rng.randint(0, 100))
+            for war_id in range(1, wars + 1)
+            for order in range(1, attacks_per_war + 1)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope='session')
+def attack_history_dir(tmp_path_factory):
+    """A year or two of wars: 500 wars x 100 attacks"""
+    directory = tmp_path_factory.mktemp('attack_history')
+    fill_attack_log(directory, wars=500, attacks_per_war=100)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def attack_table_dir(tmp_path_factory):
+    """1M attacks (10k wars x 100) for manage_war's table queries"""
+    directory = tmp_path_factory.mktemp('attack_table')
+    fill_attack_log(directory, wars=10_000, attacks_per_war=100)
+    return directory
+
+
+def seed_kudos(bot, players, awards, seed=0):
+    """players rows in kudos plus awards ledger entries spread over the last year"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    with sqlite3.connect('fb_messages.db') as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            'INSERT INTO kudos (coc_name, total_kudos) VALUES (?, ?)',
+            ((f"player-{index}", rng.randint(0, 500)) for index in range(players))
+        )
+        for _ in range(awards):
+            kudos_ledger.record_award(
+                cursor,
+                f"player-{int(rng.paretovariate(1.2)) % players}",
+                giver=f"giver-{rng.randint(0, 200)}",
+                timestamp=now - rng.randint(0, 365 * 86400)
+            )
+        conn.commit()
+    bot.leaderboard_cache.clear()
+
+
+@pytest.fixture(scope='session')
+def kudos_dataset(tmp_path_factory):
+    """FacebookMessenger over 100k kudos rows and 100k ledger awards (no browser is launched)"""
+    directory = tmp_path_factory.mktemp('kudos')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(directory)
+        bot = FacebookMessenger()
+        seed_kudos(bot, players=100_000, awards=100_000)
+    yield directory, bot
+    bot.close()
+
+
+@pytest.fixture
+def kudos_bot(kudos_dataset, monkeypatch):
+    directory, bot = kudos_dataset
+    monkeypatch.chdir(directory)
+    return bot
+
+
+@pytest.fixture
+def kudos_write_bot(kudos_dataset, tmp_path, monkeypatch):
+    """kudos_bot over a private copy of the 100k database, so writes never reach the shared dataset"""
+    directory, bot = kudos_dataset
+    with sqlite3.connect(str(directory / 'fb_messages.db')) as source, \
+            sqlite3.connect(str(tmp_path / 'fb_messages.db')) as copy:
+        source.backup(copy)
+    monkeypatch.chdir(tmp_path)
+    yield bot
+    bot.leaderboard_cache.clear()
+
+
+@pytest.fixture
+def command_bot(tmp_path, monkeypatch):
+    """FacebookMessenger with a small kudos history and a 50v50 war snapshot"""
+    monkeypatch.chdir(tmp_path)
+    bot = FacebookMessenger()
+    seed_kudos(bot, players=1000, awards=10_000)
+    bot.war_monitor = CocMonitor()
+    bot.war_monitor.update_war_snapshot(make_war_payload(50))
+    yield bot
+    bot.close()
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,94 @@
+# browser_actor.py
+import asyncio
+import contextvars
+import queue
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserActor:
+    """
+    Dedicated thread that owns the Selenium driver.
+
+    Every browser operation (scrape, send, refresh, login) is queued here and
+    runs one at a time, so the listener can never navigate away while a send
+    is typing. Callers get a future back: async code awaits it with run(),
+    threads block on it with call().
+
+    Cancellation and timeouts: an operation cancelled before it starts is
+    dropped. Selenium calls cannot be interrupted mid-flight, so an operation
+    that is already running finishes on the actor thread and its result is
+    discarded.
+    """
+
+    def __init__(self, name="browser-actor"):
+        self.commands = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.commands.get()
+            if item is None:
+                break
+
+            future, context, fn, args, kwargs = item
+            # Skip operations whose caller gave up while they were queued
+            if not future.set_running_or_notify_cancel():
+                logger.debug(f"Skipping cancelled browser operation: {getattr(fn, '__name__', fn)}")
+                continue
+
+            try:
+                result = context.run(fn, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def in_actor(self):
+        return threading.current_thread() is self.thread
+
+    def pending(self):
+        return self.commands.qsize()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on the browser thread and return a Future"""
+        future = Future()
+        if self.in_actor():
+            # Already on the browser thread (nested call): run inline to avoid deadlock
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        # Carry the caller's context (e.g. the current tracing span) to the browser thread
+        self.commands.put((future, contextvars.copy_context(), fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Blocking call from a regular thread"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """Await fn on the browser thread, with an optional per-operation timeout"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            # Cancelling the awaiting task also cancels the queued operation
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Browser operation {getattr(fn, '__name__', fn)} timed out after {timeout}s")
+            raise
+
+    def stop(self, timeout=None):
+        """Finish queued operations and stop the thread"""
+        self.commands.put(None)
+        self.thread.join(timeout)
@@ -4,35 +4,62 @@ from aiohttp import ClientSession, TCPConnector
 from datetime import datetime
 import pytz
 import logging
+import re
+import time
 from config import COC_API_TOKEN, CLAN_TAG, TIMEZONE
+from metrics import API_LATENCY, API_ERRORS, API_RATE_LIMIT
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+WAR_STATE_LABELS = {
+    'preparation': "Preparation day",
+    'inWar': "Battle day",
+    'warEnded': "War ended",
+    'notInWar': "Not in war",
+}
+
 class CocMonitor:
     def __init__(self):
         self.current_state = None
         self.last_opponent = None
+        # Latest /currentwar payload and the !warstatus replies rendered from it
+        self.war_snapshot = None
+        self.war_snapshot_key = None
+        self.war_views = {}
+        self.war_deadline = None
+        self.war_renders = 0
 
     async def fetch_data(self, session, endpoint):
         """Generic API request handler"""
-        try:
-            url = f"https://api.clashofclans.com/v1{endpoint}"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 503:
-                    logger.warning("⚠️ Clash of Clans API is under maintenance.")
-                    return {"maintenance": True}
-                else:
-                    error_body = await response.text()
-                    logger.error(f"API Error {response.status}: {error_body}")
-                    return None
+        # One metrics series per endpoint shape, not per clan tag
+        label = re.sub(r'%23[0-9A-Za-z]+', '{tag}', endpoint.split('?')[0])
+        with span('fetch', endpoint=label):
+            started = time.perf_counter()
+            try:
+                url = f"https://api.clashofclans.com/v1{endpoint}"
+                async with session.get(url) as response:
+                    remaining = response.headers.get("X-Ratelimit-Remaining")
+                    if remaining is not None and remaining.isdigit():
+                        API_RATE_LIMIT.set(int(remaining))
 
-                logger.error(f"API Error: {response.status}")
+                    if response.status == 200:
+                        return await response.json()
+                    elif response.status == 503:
+                        logger.warning("⚠️ Clash of Clans API is under maintenance.")
+                        API_ERRORS.inc(endpoint=label, status=503)
+                        return {"maintenance": True}
+                    else:
+                        error_body = await response.text()
+                        logger.error(f"API Error {response.status}: {error_body}")
+                        API_ERRORS.inc(endpoint=label, status=response.status)
+                        return None
+            except Exception as e:
+                logger.error(f"Request failed: {str(e)}")
+                API_ERRORS.inc(endpoint=label, status="error")
                 return None
-        except Exception as e:
-            logger.error(f"Request failed: {str(e)}")
-            return None
+            finally:
+                API_LATENCY.observe(time.perf_counter() - started, endpoint=label)
 
     async def get_raid_weekend_data(self):
         """Get the current capital raid season (raid weekend) data"""
@@ -95,6 +122,8 @@ class CocMonitor:
             if not war_data:
                 return None
 
+            self.update_war_snapshot(war_data)
+
             return {
                 "state": war_data.get("state", "notInWar"),
                 "opponent": war_data.get("opponent", {}).get("name"),
@@ -144,6 +173,9 @@ class CocMonitor:
                 f"/clans/{CLAN_TAG.replace('#', '%23')}/currentwar"
             )
 
+            if war_data:
+                self.update_war_snapshot(war_data)
+
             if not war_data or war_data.get('state') not in ['inWar', 'warEnded']:
                 # logger.warning("No active or ended war data available.")
                 return []
@@ -241,6 +273,90 @@ class CocMonitor:
                 }
             }
 
+    def update_war_snapshot(self, war_data):
+        """
+        Keep the latest war payload and re-render the !warstatus replies,
+        but only when something players can see has changed.
+        """
+        if war_data.get('maintenance'):
+            return
+
+        clan = war_data.get('clan', {})
+        opponent = war_data.get('opponent', {})
+        key = (
+            war_data.get('state'), war_data.get('startTime'), war_data.get('endTime'),
+            clan.get('stars'), clan.get('attacks'), clan.get('destructionPercentage'),
+            opponent.get('stars'), opponent.get('attacks'), opponent.get('destructionPercentage'),
+        )
+        self.war_snapshot = war_data
+        if key == self.war_snapshot_key:
+            return
+
+        state = war_data.get('state', 'notInWar')
+        self.war_deadline = war_data.get('startTime') if state == 'preparation' else war_data.get('endTime')
+        self.war_views = self.render_war_views(war_data)
+        self.war_snapshot_key = key
+        self.war_renders += 1
+
+    def render_war_views(self, war_data):
+        """Pre-render every !warstatus variant for one snapshot"""
+        state = war_data.get('state', 'notInWar')
+        if state == 'notInWar':
+            message = "🕊️ The clan is not in a war right now."
+            return {'summary': message, 'remaining': message, 'top': message}
+
+        clan = war_data.get('clan', {})
+        opponent = war_data.get('opponent', {})
+        team_size = war_data.get('teamSize') or len(clan.get('members', []))
+        per_member = war_data.get('attacksPerMember', 1)
+        members = sorted(clan.get('members', []), key=lambda m: m.get('mapPosition', 0))
+        header = f"⚔️ {clan.get('name', 'Us')} vs {opponent.get('name', 'Unknown')} ({team_size}v{team_size})"
+
+        summary = [
+            header,
+            f"📍 {WAR_STATE_LABELS.get(state, state)}",
+            f"⭐ {clan.get('stars', 0)} - {opponent.get('stars', 0)}",
+            f"💥 {clan.get('destructionPercentage', 0):.2f}% - {opponent.get('destructionPercentage', 0):.2f}%",
+            f"🗡️ Attacks used: {clan.get('attacks', 0)}/{team_size * per_member}",
+        ]
+
+        if state == 'preparation':
+            remaining = [header, "Attacks open when battle day starts."]
+        else:
+            pending = [
+                f"#{m.get('mapPosition', '?')} {m.get('name')}: {per_member - len(m.get('attacks', []))} left"
+                for m in members
+                if len(m.get('attacks', [])) < per_member
+            ]
+            remaining = [header, f"🗡️ {len(pending)} members with attacks left:"] + (pending or ["Everyone has attacked! 🎉"])
+
+        hitters = []
+        for m in members:
+            attacks = m.get('attacks', [])
+            if attacks:
+                stars = sum(a.get('stars', 0) for a in attacks)
+                destruction = sum(a.get('destructionPercentage', 0) for a in attacks) / len(attacks)
+                hitters.append((stars, destruction, m.get('name'), len(attacks)))
+        hitters.sort(key=lambda h: (-h[0], -h[1], h[2] or ''))
+        top = [header, "🏅 Top hitters:"] + [
+            f"{rank}. {name} ⭐{stars} {destruction:.0f}% avg ({count} attacks)"
+            for rank, (stars, destruction, name, count) in enumerate(hitters[:5], 1)
+        ]
+        if not hitters:
+            top.append("No attacks yet.")
+
+        return {'summary': "\n".join(summary), 'remaining': "\n".join(remaining), 'top': "\n".join(top)}
+
+    def war_view(self, kind='summary'):
+        """Reply for !warstatus from the cached snapshot; no API call"""
+        view = self.war_views.get(kind)
+        if view is None:
+            return None
+        if kind == 'summary' and self.war_deadline and self.war_snapshot.get('state') in ('preparation', 'inWar'):
+            label = "Starts in" if self.war_snapshot.get('state') == 'preparation' else "Ends in"
+            view += f"\n⏳ {label}: {self.get_remaining_time_str(self.war_deadline)}"
+        return view
+
     def parse_coc_time(self, coc_time_str):
         """Parse COC API timestamp string to datetime"""
         if not coc_time_str:
@@ -0,0 +1,360 @@
+# commands.py
+import re
+import random
+import time
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import kudos_ledger
+from metrics import COMMANDS
+
+logger = logging.getLogger(__name__)
+
+
+class Arg:
+    """
+    One positional argument in a command's schema.
+
+    kind converts the token (raising ValueError if it does not fit), choices
+    restricts it to fixed words, minimum/maximum clamp numbers, and rest=True
+    swallows all remaining tokens as one string.
+    """
+
+    def __init__(self, name, kind=str, required=True, default=None, choices=None,
+                 minimum=None, maximum=None, rest=False, label=None):
+        self.name = name
+        self.label = label or name
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.choices = tuple(choices) if choices else None
+        self.minimum = minimum
+        self.maximum = maximum
+        self.rest = rest
+
+    def convert(self, token):
+        if self.choices:
+            token = token.lower()
+            if token not in self.choices:
+                raise ValueError(f"{self.name} must be one of {', '.join(self.choices)}")
+        value = self.kind(token)
+        if self.minimum is not None:
+            value = max(self.minimum, value)
+        if self.maximum is not None:
+            value = min(self.maximum, value)
+        return value
+
+    def usage(self):
+        label = "|".join(self.choices) if self.choices else self.label
+        return label if self.required else f"[{label}]"
+
+
+def day_ordinal(token):
+    """YYYY-MM-DD -> date ordinal"""
+    return datetime.strptime(token, '%Y-%m-%d').date().toordinal()
+
+
+def player_name(text):
+    """
+    An in-game name. '@name' or a quoted name is always taken literally, so
+    players called e.g. 'weekly' can still get kudos; a bare mistyped date
+    range must not be awarded kudos.
+    """
+    if text.startswith('@'):
+        name = text[1:].strip()
+    elif len(text) > 1 and text[0] == text[-1] and text[0] in '"\'':
+        name = text[1:-1].strip()
+    elif re.match(r'\d{4}-\d{1,2}-\d{1,2}\b', text):
+        raise ValueError(f"{text!r} looks like a date")
+    else:
+        name = text
+    if not name:
+        raise ValueError("missing player name")
+    return name
+
+
+class Command:
+    def __init__(self, name, handler, args=(), help="", group="General", writes=False):
+        self.name = name
+        self.handler = handler
+        self.args = list(args)
+        self.help = help
+        self.group = group
+        # Changes state: never folded into an earlier reply, and run alone in message order
+        self.writes = writes
+
+    def usage(self):
+        return " ".join([f"!{self.name}"] + [arg.usage() for arg in self.args])
+
+    def bind(self, tokens):
+        """Match tokens against the schema; returns kwargs or raises ValueError"""
+        if not self.args:
+            return {}  # Commands without arguments ignore extra words ("!hey bot")
+        values = {}
+        position = 0
+        for arg in self.args:
+            if arg.rest:
+                remainder = " ".join(tokens[position:])
+                if not remainder and arg.required:
+                    raise ValueError(f"missing {arg.name}")
+                values[arg.name] = arg.convert(remainder) if remainder else arg.default
+                position = len(tokens)
+                continue
+
+            if position < len(tokens):
+                try:
+                    values[arg.name] = arg.convert(tokens[position])
+                    position += 1
+                    continue
+                except ValueError:
+                    if arg.required:
+                        raise
+            elif arg.required:
+                raise ValueError(f"missing {arg.name}")
+            values[arg.name] = arg.default
+
+        if position < len(tokens):
+            raise ValueError(f"unexpected {tokens[position]!r}")
+        return values
+
+
+class CommandRegistry:
+    """
+    Table of chat commands keyed by name.
+
+    Commands register with the @registry.command decorator, giving their
+    argument schema and help line. A name may be registered more than once
+    (overloads); dispatch tries them in registration order and uses the first
+    schema the arguments fit. The message is tokenized once, the command is
+    found with a single dict lookup, and !help is generated from the table.
+    """
+
+    def __init__(self):
+        self.commands = {}  # name -> [Command, ...]
+        self.counts = Counter()
+        self.total_time = defaultdict(float)
+        self.max_time = defaultdict(float)
+
+    def command(self, name, args=(), help="", group="General", writes=False):
+        def register(handler):
+            self.commands.setdefault(name, []).append(Command(name, handler, args, help, group, writes))
+            return handler
+        return register
+
+    def tokenize(self, text):
+        """'!Kudos weekly 5' -> ('kudos', ['weekly', '5'])"""
+        if not text or not text.startswith('!'):
+            return None, []
+        tokens = text[1:].split()
+        if not tokens:
+            return None, []
+        return tokens[0].lower(), tokens[1:]
+
+    def writes(self, text):
+        """True if text would run a state-changing command (the overload its arguments fit)"""
+        name, tokens = self.tokenize(text)
+        for overload in self.commands.get(name, ()):
+            try:
+                overload.bind(tokens)
+            except ValueError:
+                continue
+            return overload.writes
+        return False
+
+    def usage(self, name):
+        return "\n".join(f"❌ Usage: {overload.usage()}" for overload in self.commands[name])
+
+    def dispatch(self, bot, text, sender=None, fold=None):
+        """
+        Run the command in text for sender and return the reply (None for
+        non-commands). fold, if given, is called with (name, arguments) once
+        the arguments are parsed; returning True suppresses the reply.
+        """
+        name, tokens = self.tokenize(text)
+        if name is None:
+            return None
+
+        started = time.perf_counter()
+        overloads = self.commands.get(name)
+        if overloads is None:
+            key = "unknown"
+            reply = "❌ Unknown command. Type `!help` for a list of available commands."
+        elif tokens == ['help']:
+            key = name
+            reply = "\n".join(f"`{overload.usage()}` - {overload.help}" for overload in overloads)
+        else:
+            key = name
+            reply = self.invoke(bot, name, overloads, tokens, sender, fold)
+
+        elapsed = time.perf_counter() - started
+        self.counts[key] += 1
+        COMMANDS.inc(command=key)
+        self.total_time[key] += elapsed
+        self.max_time[key] = max(self.max_time[key], elapsed)
+        logger.info(f"Command !{name} from {sender} handled in {elapsed * 1000:.1f}ms")
+        return reply
+
+    def invoke(self, bot, name, overloads, tokens, sender, fold=None):
+        for overload in overloads:
+            try:
+                kwargs = overload.bind(tokens)
+            except ValueError:
+                continue
+            if fold is not None and not overload.writes and fold((name, tuple(sorted(kwargs.items())))):
+                return None
+            try:
+                return overload.handler(bot, sender, **kwargs)
+            except Exception as e:
+                logger.error(f"Error in command !{name}: {e}", exc_info=True)
+                return f"❌ An error occurred while processing your command: {e}"
+        return self.usage(name)
+
+    def help_text(self):
+        groups = {}
+        for overloads in self.commands.values():
+            for overload in overloads:
+                groups.setdefault(overload.group, []).append(f"`{overload.usage()}` - {overload.help}")
+
+        lines = ["🤖 *Available Commands* 🤖"]
+        for group, entries in groups.items():
+            lines.append("")
+            lines.append(f"*{group}*:")
+            lines.extend(entries)
+        lines.append("")
+        lines.append("Type any command with `help` for more info (e.g., `!kudos help`)")
+        return "\n".join(lines)
+
+    def stats(self):
+        return {
+            name: {
+                'count': count,
+                'mean_ms': round(self.total_time[name] / count * 1000, 3),
+                'max_ms': round(self.max_time[name] * 1000, 3),
+            }
+            for name, count in self.counts.items()
+        }
+
+
+registry = CommandRegistry()
+
+JOKES = [
+    # 👨‍💻 Programming Jokes
+    "Why don't programmers like nature? It has too many bugs.",
+    "Why do Java developers wear glasses? Because they don't C#.",
+    "How do you comfort a JavaScript bug? You console it.",
+    "I told my computer I needed a break, and now it won't stop sending me KitKat ads.",
+    "Programmer's diet: food() && sleep() && code();",
+
+    # 🏰 Clash of Clans Jokes
+    "Why did the Barbarian go to school? To improve his *clash*ifications.",
+    "Why did the Archer break up with the Giant? She needed space... 5 tiles, to be exact.",
+    "Why did the Clan Castle refuse to talk? It didn't want to *clash*.",
+    "What's a Wall Breaker's favorite song? 'We Will Rock You.'",
+    "Why was the Goblin always broke? He kept raiding the wrong storages.",
+    "Why did the Witch get kicked from the clan? Too many *skeletons* in her closet.",
+    "What do you call a Hog Rider who can't ride? Just a guy with a hammer.",
+    "Why did the P.E.K.K.A bring a pencil to battle? To draw first blood.",
+    "Why don't Clashers play hide and seek? Because you can't hide from an Eagle Artillery.",
+    "Why did the Town Hall blush? Because it saw the Archer Queen.",
+    "How do Clashers stay cool in battle? They chill near an Ice Golem.",
+    "Why was the Builder always calm? Because he knew how to constructively handle problems.",
+    "What's the Archer Queen's favorite movie? 'Legolas: A True Story'.",
+    "Why did the Lava Hound fail math? It always split during division.",
+]
+
+BOT_INFO = """🤖 *Bot Information* 🤖
+
+*Version*: 1.0.0
+*Last Updated*: 2025-04-17
+
+*Features*:
+✅ Facebook Messenger automation
+✅ Command processing (!help for list)
+✅ Message tracking
+✅ Automated responses
+✅ War monitoring
+✅ Kudos system
+
+*Technical*:
+🐍 Python 3.10+
+🌐 Selenium WebDriver
+💾 SQLite database
+⏰ 24/7 operation
+
+*Maintained and Developed By*:
+👤 Joma
+
+Type `!help` for a list of commands"""
+
+LEADERBOARD_PERIODS = ('total',) + kudos_ledger.PERIODS
+
+
+@registry.command('help', help="Show this help message")
+def help_command(bot, sender):
+    return registry.help_text()
+
+
+@registry.command('info', help="Show bot information")
+def info_command(bot, sender):
+    return BOT_INFO
+
+
+@registry.command('status', help="Check if bot is online")
+def status_command(bot, sender):
+    return "🟢 I'm online and ready to help! Type !help for options."
+
+
+@registry.command('hey', help="Say hello")
+def hey_command(bot, sender):
+    return "👋 Hello there! Type !help to see what I can do!"
+
+
+@registry.command('joke', help="Get a random joke")
+def joke_command(bot, sender):
+    return random.choice(JOKES)
+
+
+@registry.command('kudos', group="Kudos", help="Show kudos leaderboard", args=[
+    Arg('period', choices=LEADERBOARD_PERIODS, required=False, default='total'),
+    Arg('limit', int, required=False, default=10, minimum=1, maximum=50),
+])
+def kudos_leaderboard_command(bot, sender, period, limit):
+    return bot.show_kudos(period, limit)
+
+
+@registry.command('kudos', group="Kudos", help="Kudos for a date range (end inclusive)", args=[
+    Arg('start', day_ordinal, label='YYYY-MM-DD'),
+    Arg('end', day_ordinal, label='YYYY-MM-DD'),
+    Arg('limit', int, required=False, default=10, minimum=1, maximum=50),
+])
+def kudos_range_command(bot, sender, start, end, limit):
+    return bot.show_kudos('range', limit, (start, end + 1))
+
+
+@registry.command('kudos', group="Kudos", help="Give kudos to a player (use @name if the name is a period, e.g. @weekly)", writes=True, args=[
+    Arg('coc_name', player_name, rest=True, label='InGameName'),
+])
+def kudos_award_command(bot, sender, coc_name):
+    if bot.give_kudos(coc_name, giver=sender):
+        return f"🎉 Kudos awarded to {coc_name}! 🎉"
+    return "❌ Failed to record kudos. Please try again later."
+
+
+@registry.command('seekudos', group="Kudos", help="Show the top 15 kudos", args=[
+    Arg('period', choices=LEADERBOARD_PERIODS, required=False, default='total'),
+])
+def seekudos_command(bot, sender, period):
+    leaderboard = bot.show_kudos(period=period, limit=15)
+    if leaderboard:
+        return f"🏆 Top 15 Kudos ({period.capitalize()}) 🏆\n\n{leaderboard}"
+    return "No kudos data available yet."
+
+
+@registry.command('warstatus', group="War", help="Current war score, attacks left or top hitters", args=[
+    Arg('view', choices=('summary', 'remaining', 'top'), required=False, default='summary'),
+])
+def warstatus_command(bot, sender, view):
+    monitor = getattr(bot, 'war_monitor', None)
+    reply = monitor.war_view(view) if monitor is not None else None
+    return reply or "⏳ No war data yet. Try again in a minute."
@@ -23,4 +23,63 @@ TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Manila'))
 CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '180'))  # Default: 3 minutes
 
 # Browser Configuration
-HEADLESS_MODE = os.getenv('HEADLESS_MODE', 'false').lower() == 'true'  # Run browser in headless mode
\ No newline at end of file
+HEADLESS_MODE = os.getenv('HEADLESS_MODE', 'false').lower() == 'true'  # Run browser in headless mode
+BROWSER_PROFILE_DIR = os.getenv('BROWSER_PROFILE_DIR', 'chrome_profile')  # Persistent Chrome profile; empty for a throwaway one
+LEAN_BROWSER = os.getenv('LEAN_BROWSER', 'false').lower() == 'true'  # Opt-in: block images, media and fonts; trim Chrome features (compare with bench_browser.py first)
+TYPING_PROFILE = os.getenv('TYPING_PROFILE', 'instant').lower()  # instant, fast or human
+SEND_TIMEOUT = float(os.getenv('SEND_TIMEOUT', '120'))  # Max seconds for one browser send
+SCRAPE_TIMEOUT = float(os.getenv('SCRAPE_TIMEOUT', '60'))  # Max seconds for one chat scrape
+SEND_CONFIRM_TIMEOUT = float(os.getenv('SEND_CONFIRM_TIMEOUT', '1.0'))  # Seconds to wait for our own row after Enter
+REPLY_BATCH_MAX_CHARS = int(os.getenv('REPLY_BATCH_MAX_CHARS', '4000'))  # Command replies merged into one post up to this size
+
+# Message History Retention
+MESSAGE_RETENTION_MINUTES = int(os.getenv('MESSAGE_RETENTION_MINUTES', '1440'))  # Default: keep 24 hours
+RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', '3600'))  # Default: purge every hour
+
+# Processed-Message Dedup Cache
+DEDUP_LRU_SIZE = int(os.getenv('DEDUP_LRU_SIZE', '1024'))  # Recent message IDs kept in memory
+DEDUP_BLOOM_ENABLED = os.getenv('DEDUP_BLOOM_ENABLED', 'true').lower() == 'true'  # Bloom filter over retained history
+DEDUP_BLOOM_CAPACITY = int(os.getenv('DEDUP_BLOOM_CAPACITY', '100000'))
+
+# Outbound Message Queue
+OUTBOUND_COALESCE_WINDOW = float(os.getenv('OUTBOUND_COALESCE_WINDOW', '5'))  # Seconds to merge attack shoutouts
+OUTBOUND_MAX_COALESCE = int(os.getenv('OUTBOUND_MAX_COALESCE', '10'))  # Max shoutouts per combined post
+
+# Event Loop Health
+LOOP_LAG_WARN_MS = float(os.getenv('LOOP_LAG_WARN_MS', '20'))  # Warn when a task blocks the loop longer than this
+
+# Session Health
+SESSION_CHECK_INTERVAL = int(os.getenv('SESSION_CHECK_INTERVAL', '60'))  # Seconds between logged-in checks
+
+# Browser Memory Watchdog
+MEMORY_CHECK_INTERVAL = int(os.getenv('MEMORY_CHECK_INTERVAL', '300'))  # Seconds between memory samples
+BROWSER_RSS_LIMIT_MB = int(os.getenv('BROWSER_RSS_LIMIT_MB', '1500'))  # Chrome process-tree RSS before recycling
+BROWSER_HEAP_LIMIT_MB = int(os.getenv('BROWSER_HEAP_LIMIT_MB', '400'))  # Chat page JS heap before recycling
+RECYCLE_QUIET_SECONDS = int(os.getenv('RECYCLE_QUIET_SECONDS', '30'))  # Idle outbound time required to recycle
+
+# Messaging Transport
+TRANSPORT = os.getenv('TRANSPORT', 'facebook').lower()  # facebook, jsonl, console or webhook
+TRANSPORT_OUTBOX = os.getenv('TRANSPORT_OUTBOX', 'outbox.jsonl')  # jsonl: where posts are appended
+TRANSPORT_INBOX = os.getenv('TRANSPORT_INBOX', 'inbox.jsonl')  # jsonl: where commands are read from
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8765'))
+WEBHOOK_CALLBACK_URL = os.getenv('WEBHOOK_CALLBACK_URL') or None  # webhook: POST posts here instead of /outbox
+
+# Command Throttling
+THROTTLE_USER_PER_MINUTE = float(os.getenv('THROTTLE_USER_PER_MINUTE', '6'))  # Sustained commands per sender
+THROTTLE_USER_BURST = int(os.getenv('THROTTLE_USER_BURST', '3'))
+THROTTLE_CHAT_PER_MINUTE = float(os.getenv('THROTTLE_CHAT_PER_MINUTE', '20'))  # Sustained commands per chat
+THROTTLE_CHAT_BURST = int(os.getenv('THROTTLE_CHAT_BURST', '10'))
+THROTTLE_FOLD_SECONDS = float(os.getenv('THROTTLE_FOLD_SECONDS', '30'))  # Identical commands inside this share one reply
+
+# Metrics Endpoint
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # Serve Prometheus metrics locally
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Tracing
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'  # Record spans for fetch, scrape and send
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')  # Rotating JSONL span log
+TRACE_MAX_MB = int(os.getenv('TRACE_MAX_MB', '10'))
+TRACE_BACKUPS = int(os.getenv('TRACE_BACKUPS', '5'))
+OTLP_ENDPOINT = os.getenv('OTLP_ENDPOINT') or None  # e.g. http://127.0.0.1:4318/v1/traces to also export to a collector
\ No newline at end of file
@@ -0,0 +1,90 @@
+# dedup_cache.py
+import hashlib
+import math
+import sqlite3
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys (no false negatives)."""
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class MessageDedup:
+    """In-memory front for message_history lookups.
+
+    A bounded LRU answers "already processed" for the rows the scraper sees on
+    every poll. The optional Bloom filter covers the whole retained history, so
+    a negative answer means the message is definitely new and SQLite is skipped.
+    Only a Bloom hit that missed the LRU needs a database query.
+
+    LRU entries keep their processed_at; once older than max_age seconds (the
+    retention window) they count as misses, so a message repeated after its
+    row was purged is treated as new again.
+    """
+
+    def __init__(self, lru_size=1024, bloom_capacity=100000, bloom_error_rate=0.01, use_bloom=True, max_age=None):
+        self.lru_size = lru_size
+        self.max_age = max_age
+        self.recent = OrderedDict()  # message_id -> processed_at (unix seconds)
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if use_bloom else None
+        self.stats = {'lru_hits': 0, 'bloom_negatives': 0, 'db_checks': 0}
+
+    def load(self, db_name='fb_messages.db'):
+        """Seed the filter and LRU from the retained message_history."""
+        try:
+            with sqlite3.connect(db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT message_id, processed_at FROM message_history ORDER BY processed_at')
+                count = 0
+                for message_id, processed_at in cursor:
+                    self.remember(message_id, processed_at)
+                    count += 1
+            logger.info(f"Dedup cache loaded {count} processed message IDs")
+        except Exception as e:
+            logger.error(f"Failed to load dedup cache: {e}")
+
+    def remember(self, message_id, processed_at=None):
+        self.recent[message_id] = processed_at if processed_at is not None else int(time.time())
+        self.recent.move_to_end(message_id)
+        if len(self.recent) > self.lru_size:
+            self.recent.popitem(last=False)
+        if self.bloom is not None:
+            self.bloom.add(message_id)
+
+    def lookup(self, message_id):
+        """Return True (seen), False (definitely new) or None (ask the database)."""
+        processed_at = self.recent.get(message_id)
+        if processed_at is not None:
+            if self.max_age is not None and time.time() - processed_at > self.max_age:
+                del self.recent[message_id]  # Past retention: the row is (or soon will be) purged
+            else:
+                self.recent.move_to_end(message_id)
+                self.stats['lru_hits'] += 1
+                return True
+        if self.bloom is not None and message_id not in self.bloom:
+            self.stats['bloom_negatives'] += 1
+            return False
+        self.stats['db_checks'] += 1
+        return None
@@ -0,0 +1,173 @@
+# dom_scripts.py
+"""JavaScript injected into the Messenger chat page."""
+import json
+
+# Same sender XPaths get_latest_messages used to try one round-trip at a time
+SENDER_XPATHS = [
+    ".//span[contains(@class, 'x1lliihq') or contains(@class, 'x1plvlek')]",
+    ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]//span//span//span",
+    ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]//span",
+    ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]",
+    ".//span[contains(@class, 'x1s688f')]//span//span"
+]
+
+# Turns one div[role='row'] into {id, senders, text, ts}. "senders" holds the
+# first match of each SENDER_XPATHS pattern, in order, so Python can apply the
+# same heuristics as before.
+_ROW_PARSER = """
+const gcBotSenderXpaths = %s;
+let gcBotSeq = (window.__gcBotSeq || 0);
+function gcBotParseRow(row) {
+    const body = row.querySelector("div[dir='auto']");
+    const text = body ? (body.innerText || '').trim() : '';
+    if (!text) return null;
+    const senders = gcBotSenderXpaths.map(function (xpath) {
+        const hit = document.evaluate(xpath, row, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return hit ? (hit.innerText || '').trim() : null;
+    });
+    const idNode = row.matches('[data-message-id]') ? row : row.querySelector('[data-message-id]');
+    if (!row.dataset.gcbotSeq) {
+        gcBotSeq += 1;
+        window.__gcBotSeq = gcBotSeq;
+        row.dataset.gcbotSeq = String(gcBotSeq);
+    }
+    return {
+        id: idNode ? idNode.getAttribute('data-message-id') : 'seq-' + row.dataset.gcbotSeq,
+        senders: senders,
+        text: text,
+        ts: Date.now()
+    };
+}
+""" % (json.dumps(SENDER_XPATHS),)
+
+# Installs a MutationObserver on the chat container that parses every new
+# message row into window.__gcBot.buffer. Returns the last `limit` existing
+# rows so messages sent while the bot was away are still seen once.
+INSTALL_OBSERVER_SCRIPT = _ROW_PARSER + """
+const limit = arguments[0];
+const container = document.querySelector("div[role='main']");
+if (!container) return null;
+if (window.__gcBot && window.__gcBot.observer) window.__gcBot.observer.disconnect();
+
+const state = {container: container, buffer: [], seen: new WeakSet(), observer: null};
+function capture(row) {
+    if (state.seen.has(row)) return;
+    const parsed = gcBotParseRow(row);
+    if (!parsed) return;  // Text not rendered yet; a later mutation will bring it back
+    state.seen.add(row);
+    state.buffer.push(parsed);
+    if (state.buffer.length > 500) state.buffer.shift();
+}
+
+state.observer = new MutationObserver(function (mutations) {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType !== 1) continue;
+            const owner = node.closest("div[role='row']");
+            if (owner) { capture(owner); continue; }
+            node.querySelectorAll("div[role='row']").forEach(capture);
+        }
+    }
+});
+state.observer.observe(container, {childList: true, subtree: true});
+window.__gcBot = state;
+
+const rows = Array.from(container.querySelectorAll("div[role='row']")).slice(-limit);
+const initial = [];
+for (const row of rows) {
+    const parsed = gcBotParseRow(row);
+    state.seen.add(row);
+    if (parsed) initial.push(parsed);
+}
+return initial;
+"""
+
+# Returns and clears the buffered rows, or null if the observer is gone
+# (navigation or reload replaced the chat container).
+DRAIN_OBSERVER_SCRIPT = """
+const state = window.__gcBot;
+if (!state || !state.container || !state.container.isConnected) return null;
+const rows = state.buffer;
+state.buffer = [];
+return rows;
+"""
+
+# One-shot scrape: parses the last `limit` rows in the page and returns them
+# as a compact array, replacing one WebDriver round-trip per row and XPath.
+# Like the per-row scan it searches the whole document when the chat
+# container is missing, so it still works when the observer cannot attach.
+BULK_EXTRACT_SCRIPT = _ROW_PARSER + """
+const limit = arguments[0];
+const root = document.querySelector("div[role='main']") || document;
+const rows = Array.from(root.querySelectorAll("div[role='row']")).slice(-limit);
+const out = [];
+for (const row of rows) {
+    const parsed = gcBotParseRow(row);
+    if (parsed) out.push(parsed);
+}
+return out;
+"""
+
+# Arms a one-shot watcher for our own outgoing row before Enter is pressed.
+# It only looks at rows added after this point and matches on letters and
+# digits alone: Messenger renders emoji as <img alt>, which innerText leaves
+# out, so symbols are dropped from both sides before comparing.
+WATCH_SEND_SCRIPT = """
+function normalize(text) { return (text || '').replace(/[^\\p{L}\\p{N}]+/gu, ' ').trim(); }
+const expected = normalize(arguments[0]);
+const container = document.querySelector("div[role='main']");
+if (!container) return false;
+if (window.__gcBotSend && window.__gcBotSend.observer) window.__gcBotSend.observer.disconnect();
+
+const watch = {done: false, observer: null};
+function check(row) {
+    if (normalize(row.innerText).indexOf(expected) !== -1) {
+        watch.done = true;
+        watch.observer.disconnect();
+    }
+}
+watch.observer = new MutationObserver(function (mutations) {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (watch.done || node.nodeType !== 1) continue;
+            const row = node.closest("div[role='row']");
+            if (row) { check(row); continue; }
+            node.querySelectorAll("div[role='row']").forEach(check);
+        }
+    }
+});
+watch.observer.observe(container, {childList: true, subtree: true});
+window.__gcBotSend = watch;
+return true;
+"""
+
+# Async script: resolves true as soon as the watched row appears, or false
+# after arguments[0] milliseconds.
+AWAIT_SEND_SCRIPT = """
+const timeoutMs = arguments[0];
+const done = arguments[arguments.length - 1];
+const watch = window.__gcBotSend;
+if (!watch) { done(false); return; }
+const started = Date.now();
+(function poll() {
+    if (watch.done) { done(true); return; }
+    if (Date.now() - started >= timeoutMs) { watch.observer.disconnect(); done(false); return; }
+    setTimeout(poll, 25);
+})();
+"""
+
+# Load timing, resource bytes and JS heap of the current page, for comparing
+# lean and full browser modes.
+PAGE_METRICS_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = 0;
+for (const entry of resources) bytes += entry.transferSize || 0;
+return {
+    load_ms: nav ? Math.round(nav.loadEventEnd - nav.startTime) : null,
+    dom_ready_ms: nav ? Math.round(nav.domContentLoadedEventEnd - nav.startTime) : null,
+    resources: resources.length,
+    transfer_bytes: bytes,
+    js_heap_bytes: performance.memory ? performance.memory.usedJSHeapSize : null
+};
+"""
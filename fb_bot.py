@@ -8,22 +8,107 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 import random
 import time
 import logging
-from config import FACEBOOK_EMAIL, FACEBOOK_PASSWORD, FB_GC_ID, HEADLESS_MODE
+from config import FACEBOOK_EMAIL, FACEBOOK_PASSWORD, FB_GC_ID, HEADLESS_MODE, MESSAGE_RETENTION_MINUTES, RETENTION_INTERVAL
+from config import BROWSER_PROFILE_DIR, LEAN_BROWSER
+from config import THROTTLE_USER_PER_MINUTE, THROTTLE_USER_BURST, THROTTLE_CHAT_PER_MINUTE, THROTTLE_CHAT_BURST, THROTTLE_FOLD_SECONDS
+from config import DEDUP_LRU_SIZE, DEDUP_BLOOM_ENABLED, DEDUP_BLOOM_CAPACITY
+from config import TYPING_PROFILE, SEND_TIMEOUT, SCRAPE_TIMEOUT, SEND_CONFIRM_TIMEOUT, REPLY_BATCH_MAX_CHARS
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime
+from message_retention import migrate_message_history, purge_message_history
+from dedup_cache import MessageDedup
+import kudos_ledger
+from outbound_queue import PRIORITY_REPLY
+from browser_actor import BrowserActor
+from commands import registry
+from throttle import CommandThrottle
+from metrics import DB_WRITE_LATENCY, BROWSER_SEND_STAGE, SCRAPE_LATENCY, metrics
+from tracing import span
+from dom_scripts import SENDER_XPATHS, INSTALL_OBSERVER_SCRIPT, DRAIN_OBSERVER_SCRIPT, BULK_EXTRACT_SCRIPT
+from dom_scripts import WATCH_SEND_SCRIPT, AWAIT_SEND_SCRIPT, PAGE_METRICS_SCRIPT
 
 logger = logging.getLogger(__name__)
 COOKIE_FILE = "fb_session_cookies.pkl"
+CHAT_URL = f"https://www.facebook.com/messages/t/{FB_GC_ID}"
+LOGIN_URL = "https://www.facebook.com/login"
+COMPOSER_XPATH = "//div[@role='textbox']"
+REPLY_SEPARATOR = "\n\n"
+LOGGED_OUT_URL_MARKERS = ("/login", "checkpoint")
+
+# Lean mode: requests the bot never needs. Avatars, stickers and attachments
+# come from scontent/video CDN hosts; Messenger's own JS and CSS are served
+# from static.xx.fbcdn.net and stay allowed.
+LEAN_BLOCKED_URLS = [
+    "*scontent*.fbcdn.net/*", "*video*.fbcdn.net/*",
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.ico", "*.svg",
+    "*.mp4", "*.webm", "*.m4a", "*.mp3", "*.ogg",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+]
+LEAN_CHROME_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required",
+    "--mute-audio",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+    "--no-first-run",
+]
+LEAN_HEADLESS_ARGS = [
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--renderer-process-limit=2",
+    "--js-flags=--max-old-space-size=512",
+]
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.media_stream": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+# Senders containing any of these are system messages and notifications
+SYSTEM_SENDER_TERMS = [
+    'facebook', 'messenger', 'notification', 'message',
+    'you and', 'liked', 'reacted', 'shared', 'group',
+    'clash of clans', 'war', 'battle', 'attack',
+    'unknown', 'system', 'admin', 'joined', 'left',
+    'created', 'poll', 'event', 'call', 'video', 'photo'
+]
 
 class FacebookMessenger:
     def __init__(self):
         self.driver = None
+        self.browser = BrowserActor()  # Only this thread touches self.driver
         self.bot_name = None  # Will be set after login
+        self.startup_seconds = None  # Launch-to-composer time of the last login
+        self.last_send_timings = {}
+        self.typing_stats = {}  # profile -> [sends, total seconds]
+        self.dedup = MessageDedup(
+            lru_size=DEDUP_LRU_SIZE,
+            bloom_capacity=DEDUP_BLOOM_CAPACITY,
+            use_bloom=DEDUP_BLOOM_ENABLED,
+            max_age=MESSAGE_RETENTION_MINUTES * 60
+        )
+        self.throttle = CommandThrottle(
+            user_per_minute=THROTTLE_USER_PER_MINUTE,
+            user_burst=THROTTLE_USER_BURST,
+            chat_per_minute=THROTTLE_CHAT_PER_MINUTE,
+            chat_burst=THROTTLE_CHAT_BURST,
+            fold_window=THROTTLE_FOLD_SECONDS
+        )
+        self.war_monitor = None  # CocMonitor whose cached snapshot answers !warstatus
+        self.leaderboard_cache = {}  # (period, window, limit) -> rendered leaderboard
         self.init_database()
+        self.dedup.load('fb_messages.db')
 
     def human_type(self, element, text, speed=0.1):
         """Type like a human with random delays"""
@@ -31,6 +116,46 @@ class FacebookMessenger:
             element.send_keys(char)
             time.sleep(random.uniform(speed / 2, speed * 1.5))
 
+    def type_message(self, element, text, profile=None):
+        """
+        Enter text into the composer using a typing profile.
+
+        Profiles:
+            instant: bulk insertion through the DevTools protocol (JS fallback)
+            fast: one send_keys call per line
+            human: per-character typing with random delays
+        Newlines become Shift+Enter so a multi-line message is sent as one post.
+        """
+        profile = profile or TYPING_PROFILE
+        for index, line in enumerate(text.split('\n')):
+            if index:
+                ActionChains(self.driver).key_down(Keys.SHIFT).send_keys(Keys.ENTER).key_up(Keys.SHIFT).perform()
+            if not line:
+                continue
+
+            if profile == 'instant':
+                try:
+                    self.driver.execute_cdp_cmd('Input.insertText', {'text': line})
+                except Exception:
+                    self.driver.execute_script(
+                        "arguments[0].focus(); document.execCommand('insertText', false, arguments[1]);",
+                        element, line
+                    )
+            elif profile == 'fast':
+                element.send_keys(line)
+            else:
+                self.human_type(element, line)
+
+        if profile == 'human':
+            time.sleep(random.uniform(0.5, 1.5))  # Wait before sending
+
+    def record_typing_time(self, profile, seconds):
+        """Track average typing time per profile"""
+        stats = self.typing_stats.setdefault(profile, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        logger.debug(f"Typing profile '{profile}': {seconds:.2f}s (avg {stats[1] / stats[0]:.2f}s over {stats[0]} sends)")
+
     def human_click(self, element):
         """Simulate a human-like click on a web element"""
         ActionChains(self.driver).move_to_element(element).pause(random.uniform(0.1, 0.3)).click().perform()
@@ -45,9 +170,10 @@ class FacebookMessenger:
                         message_id TEXT PRIMARY KEY,
                         sender TEXT,
                         message TEXT,
-                        processed_at TEXT
+                        processed_at INTEGER NOT NULL
                     )
                 ''')
+                migrate_message_history(conn)
 
                 # Kudos tracking table
                 cursor.execute('''
@@ -55,112 +181,89 @@ class FacebookMessenger:
                         player_id INTEGER PRIMARY KEY AUTOINCREMENT,
                         coc_name TEXT NOT NULL UNIQUE,
                         total_kudos INTEGER DEFAULT 0,
-                        weekly_kudos INTEGER DEFAULT 0,
                         last_kudos_date TEXT  
                     )
                 ''')
 
+                # Append-only award history with daily/weekly buckets
+                kudos_ledger.init_ledger(cursor)
+
+                # Leaderboard indexes (covering, so ORDER BY ... LIMIT reads only the top rows)
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_kudos_total
+                    ON kudos (total_kudos DESC, coc_name)
+                ''')
+                kudos_ledger.retire_weekly_column(cursor)
+
                 conn.commit()
             logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
 
-    def give_kudos(self, coc_name: str):
+    def give_kudos(self, coc_name: str, giver: str = None):
         """Award kudos to a player by their CoC name"""
         try:
-            with sqlite3.connect('fb_messages.db') as conn:
+            with DB_WRITE_LATENCY.time(op='give_kudos'), sqlite3.connect('fb_messages.db') as conn:
                 cursor = conn.cursor()
                 
                 # Insert or update player record
                 cursor.execute('''
-                    INSERT INTO kudos (coc_name, total_kudos, weekly_kudos, last_kudos_date)
-                    VALUES (?, 1, 1, DATE('now'))
+                    INSERT INTO kudos (coc_name, total_kudos, last_kudos_date)
+                    VALUES (?, 1, DATE('now'))
                     ON CONFLICT(coc_name) DO UPDATE SET
                         total_kudos = total_kudos + 1,
-                        weekly_kudos = weekly_kudos + 1,
                         last_kudos_date = DATE('now')
                 ''', (coc_name,))
+
+                # Record the award itself so windowed leaderboards keep history
+                kudos_ledger.record_award(cursor, coc_name, giver)
                 
                 conn.commit()
+            # Rankings changed, so every rendered leaderboard is stale
+            self.leaderboard_cache.clear()
             return True
         except Exception as e:
             logger.error(f"Failed to give kudos: {e}")
             return False
-    
-    def handle_command(self, message: str, sender: str = None) -> str:
-        """
-        Handle incoming commands and return appropriate response
-        
-        Args:
-            message: The message content
-            sender: Name of the message sender (optional)
-            
-        Returns:
-            Response message or None if no command was handled
-        """
-        try:
-            if not message or not isinstance(message, str) or not message.startswith('!'):
-                return None
-                
-            # Clean up the message
-            message = message.strip()
-            
-            # Split into command and arguments
-            command_parts = message[1:].split()
-            if not command_parts:
-                return None
-                
-            command = command_parts[0].lower()
-            args = command_parts[1:]
-            
-            logger.info(f"Processing command: {command} with args: {args} from {sender}")
-            
-            if command == 'kudos':
-                period = 'total'
-                limit = 10
-                
-                # Parse period if provided
-                if args and args[0].lower() in ['total', 'weekly']:
-                    period = args[0].lower()
-                    args = args[1:]
-                
-                # Parse limit if provided
-                if args and args[0].isdigit():
-                    limit = min(50, max(1, int(args[0])))  # Limit between 1-50
-                
-                return self.show_kudos(period, limit)
-                
-            elif command == 'help':
-                return (
-                    "=== BOT COMMANDS ===\n"
-                    "!kudos [total|weekly] [limit] - Show kudos leaderboard\n"
-                    "!help - Show this help message\n"
-                    "=================="
-                )
-                
-            return f"Unknown command: {command}. Type !help for available commands."
-            
-        except Exception as e:
-            logger.error(f"Error handling command '{message}': {str(e)}")
-            return None
 
-    def show_kudos(self, period: str = "total", limit: int = 10) -> str:
+    def show_kudos(self, period: str = "total", limit: int = 10, window: tuple = None) -> str:
         """
         Generate formatted kudos leaderboard
         Args:
-            period: 'total' or 'weekly'
+            period: 'total', 'weekly', 'monthly', 'season' or 'range'
             limit: Number of entries to show
+            window: (start, end) day ordinals, required for 'range'
         Returns:
             Formatted leaderboard string
         """
+        # Windowed periods are keyed by their window, so a new week/month is a new entry
+        if window is None and period in kudos_ledger.PERIODS:
+            window = kudos_ledger.period_window(period)
+        cache_key = (period, window, limit)
+
+        cached = self.leaderboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            results = self.get_kudos_leaderboard(period, limit)
+            results = self.get_kudos_leaderboard(period, limit, window)
             
             if not results:
+                self.leaderboard_cache[cache_key] = "No kudos records found"
                 return "No kudos records found"
                 
             # Create header
-            period_title = "Lifetime" if period == "total" else "Weekly"
+            if period == "range":
+                first = date.fromordinal(window[0])
+                last = date.fromordinal(window[1] - 1)
+                period_title = f"{first:%Y-%m-%d} to {last:%Y-%m-%d}"
+            else:
+                period_title = {
+                    "total": "Lifetime",
+                    "weekly": "Weekly",
+                    "monthly": "Monthly",
+                    "season": "Season",
+                }.get(period, "Lifetime")
             leaderboard = [
                 f"----- {period_title} Kudos Leaderboard -----",
                 "Rank    Player            Kudos",
@@ -173,26 +276,32 @@ class FacebookMessenger:
                 
             # Add footer
             leaderboard.append("--------------------------------")
-            leaderboard.append("Type '!seekudos weekly' for weekly rankings")
+            leaderboard.append("Type '!seekudos weekly|monthly|season' for other rankings")
             
-            return "\n".join(leaderboard)
+            rendered = "\n".join(leaderboard)
+            self.leaderboard_cache[cache_key] = rendered
+            return rendered
             
         except Exception as e:
             logger.error(f"Failed to generate kudos display: {e}")
             return "Error retrieving leaderboard"
 
-    def get_kudos_leaderboard(self, period: str = "total", limit: int = 10) -> list:
+    def get_kudos_leaderboard(self, period: str = "total", limit: int = 10, window: tuple = None) -> list:
         """Retrieve raw kudos data from database"""
         try:
-            column = "total_kudos" if period == "total" else "weekly_kudos"
-            
             with sqlite3.connect('fb_messages.db') as conn:
                 cursor = conn.cursor()
-                
-                cursor.execute(f'''
-                    SELECT coc_name, {column} as score
+
+                # Windowed periods are answered from the ledger buckets
+                if period != "total":
+                    if window is None:
+                        window = kudos_ledger.period_window(period)
+                    return kudos_ledger.leaderboard(cursor, window[0], window[1], limit)
+
+                cursor.execute('''
+                    SELECT coc_name, total_kudos as score
                     FROM kudos
-                    ORDER BY score DESC
+                    ORDER BY total_kudos DESC, coc_name
                     LIMIT ?
                 ''', (limit,))
                 
@@ -203,16 +312,23 @@ class FacebookMessenger:
             return []
 
     def is_message_processed(self, message_id):
-        """Check if a message has already been processed"""
+        """Check if a message has already been processed (memory first, database on a possible hit)"""
+        cached = self.dedup.lookup(message_id)
+        if cached is not None:
+            return cached
+
         try:
             with sqlite3.connect('fb_messages.db') as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    SELECT 1 FROM message_history 
+                    SELECT processed_at FROM message_history 
                     WHERE message_id = ? 
                     LIMIT 1
                 """, (message_id,))
-                return cursor.fetchone() is not None
+                row = cursor.fetchone()
+            if row is not None:
+                self.dedup.remember(message_id, row[0])
+            return row is not None
         except Exception as e:
             logger.error(f"Error checking message history: {e}")
             # If there's an error checking, assume message is processed to avoid duplicates
@@ -221,9 +337,9 @@ class FacebookMessenger:
 
     def mark_message_as_processed(self, message_id, sender, message):
         """Mark a message as processed in the database"""
-        processed_at = datetime.utcnow().isoformat()
+        processed_at = int(time.time())
         try:
-            with sqlite3.connect('fb_messages.db') as conn:
+            with DB_WRITE_LATENCY.time(op='mark_processed'), sqlite3.connect('fb_messages.db') as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR IGNORE INTO message_history 
@@ -231,6 +347,7 @@ class FacebookMessenger:
                     VALUES (?, ?, ?, ?)
                 ''', (message_id, sender, message, processed_at))
                 conn.commit()
+            self.dedup.remember(message_id, processed_at)
         except Exception as e:
             logger.error(f"Failed to mark message as processed: {e}")
             # If we can't mark it as processed, we'll try again next time
@@ -239,29 +356,27 @@ class FacebookMessenger:
     def save_processed_message(self, message_id, sender, message):
         """Save processed message to database"""
         try:
-            with sqlite3.connect('fb_messages.db') as conn:
+            with DB_WRITE_LATENCY.time(op='save_processed'), sqlite3.connect('fb_messages.db') as conn:
                 cursor = conn.cursor()
-                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                current_time = int(time.time())
                 cursor.execute('''
                     INSERT OR REPLACE INTO message_history (message_id, sender, message, processed_at)
                     VALUES (?, ?, ?, ?)
                 ''', (message_id, sender, message, current_time))
                 conn.commit()
+            self.dedup.remember(message_id, current_time)
             return True
         except Exception as e:
             logger.error(f"Failed to save message to database: {e}")
             return False
 
-    def cleanup_old_messages(self, minutes=1440):
-        """Clean up messages older than specified minutes"""
+    def cleanup_old_messages(self, minutes=MESSAGE_RETENTION_MINUTES):
+        """Clean up messages older than specified minutes (batched, then incremental vacuum)"""
         try:
-            with sqlite3.connect('fb_messages.db') as conn:
-                cursor = conn.cursor()
-                cutoff_time = (datetime.now() - timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
-                cursor.execute('DELETE FROM message_history WHERE processed_at < ?', (cutoff_time,))
-                conn.commit()
+            return purge_message_history(max_age_minutes=minutes, db_name='fb_messages.db')
         except Exception as e:
             logger.error(f"Failed to cleanup old messages: {e}")
+            return None
 
     def save_cookies(self):
         """Save current session cookies to file."""
@@ -269,7 +384,6 @@ class FacebookMessenger:
         try:
             if "facebook.com" not in self.driver.current_url:
                 self.driver.get("https://www.facebook.com/")
-                time.sleep(2)
 
             with open(COOKIE_FILE, "wb") as file:
                 pickle.dump(self.driver.get_cookies(), file)
@@ -287,14 +401,14 @@ class FacebookMessenger:
             return False
 
         try:
-            self.driver.get("https://www.facebook.com/")
-            time.sleep(2)
+            # Cookies can only be added for the domain currently loaded
+            if "facebook.com" not in self.driver.current_url:
+                self.driver.get("https://www.facebook.com/")
 
             with open(COOKIE_FILE, "rb") as file:
                 cookies = pickle.load(file)
 
             self.driver.delete_all_cookies()
-            time.sleep(1)
 
             for cookie in cookies:
                 if all(k in cookie for k in ['name', 'value', 'domain']) and 'facebook.com' in cookie['domain']:
@@ -310,41 +424,40 @@ class FacebookMessenger:
             logger.error(f"❌ Failed to load cookies: {str(e)}")
             return False
 
-    def verify_login(self, timeout=15):
-        """Verify if user is logged in by checking key elements."""
-        logger.info("🔄 Verifying user...")
-        try:
-            checks = [
-                EC.presence_of_element_located((By.XPATH, "//a[@href='/messages/']")),
-                EC.presence_of_element_located((By.XPATH, "//div[@aria-label='Facebook']")),
-                EC.presence_of_element_located((By.XPATH, "//span[contains(text(),'Marketplace')]"))
-            ]
-            for check in checks:
-                try:
-                    WebDriverWait(self.driver, timeout).until(check)
-                    return True
-                except:
-                    continue
-            return False
-        except Exception as e:
-            logger.error(f"❌ Login verification failed: {str(e)}")
+    def wait_for_session(self, timeout=15):
+        """
+        Probe the loaded page until it shows either the chat composer or the
+        login form, instead of sleeping a fixed time after each navigation.
+
+        Returns 'ready', 'login', or None if neither appeared in time.
+        """
+        def probe(driver):
+            if driver.find_elements(By.XPATH, COMPOSER_XPATH):
+                return 'ready'
+            if any(marker in driver.current_url for marker in LOGGED_OUT_URL_MARKERS):
+                return 'login'
+            if driver.find_elements(By.NAME, 'email'):
+                return 'login'
             return False
 
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(probe)
+        except TimeoutException:
+            return None
+
     def try_cookie_login(self):
-        """Attempt login using saved cookies."""
+        """Attempt login by replaying the saved cookies into the current browser."""
+        if not os.path.exists(COOKIE_FILE):
+            return False
+
         logger.info("🔄 Attempting to login using saved cookies...")
 
         try:
-            self.driver.get("https://www.facebook.com/")
-            time.sleep(2)
-
             if not self.load_cookies():
                 return False
 
-            self.driver.refresh()
-            time.sleep(3)
-
-            if self.verify_login(timeout=10):
+            self.driver.get(CHAT_URL)
+            if self.wait_for_session(timeout=10) == 'ready':
                 logger.info("✅ Logged in via cookies")
                 self.save_cookies()
                 return True
@@ -356,14 +469,62 @@ class FacebookMessenger:
             logger.warning(f"⚠️ Cookie login failed: {str(e)}")
             return False
 
+    def automated_login(self):
+        """Log in with FACEBOOK_EMAIL/FACEBOOK_PASSWORD in the already-open browser."""
+        if not FACEBOOK_EMAIL or not FACEBOOK_PASSWORD:
+            logger.error("❌ No valid session and FACEBOOK_EMAIL/FACEBOOK_PASSWORD are not set")
+            return False
+
+        logger.info("🔑 Logging in with credentials...")
+        try:
+            if "checkpoint" in self.driver.current_url:
+                return self.handle_captcha()
+
+            # The chat URL usually redirects to the login form already
+            if not self.driver.find_elements(By.NAME, 'email'):
+                self.driver.get(LOGIN_URL)
+
+            email_input = WebDriverWait(self.driver, 10).until(
+                EC.element_to_be_clickable((By.NAME, 'email'))
+            )
+            email_input.clear()
+            self.human_type(email_input, FACEBOOK_EMAIL, speed=0.05)
+
+            password_input = self.driver.find_element(By.NAME, 'pass')
+            password_input.clear()
+            self.human_type(password_input, FACEBOOK_PASSWORD, speed=0.05)
+            password_input.send_keys(Keys.ENTER)
+
+            # Wait for the form to go away (home page, chat or a checkpoint)
+            WebDriverWait(self.driver, 20).until(EC.staleness_of(password_input))
+
+            if "checkpoint" in self.driver.current_url:
+                return self.handle_captcha()
+
+            self.driver.get(CHAT_URL)
+            if self.wait_for_session() != 'ready':
+                logger.error("❌ Automated login failed: chat did not load after submitting credentials")
+                return False
+
+            logger.info("✅ Logged in with credentials")
+            self.save_cookies()
+            return True
+
+        except TimeoutException:
+            logger.error("❌ Automated login timed out (login form missing or not submitted)")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Automated login failed: {str(e)}")
+            return False
+
     def handle_captcha(self):
         """Handle CAPTCHA manually."""
         try:
             logger.warning("🛑 CAPTCHA detected! Please solve it manually.")
             input("⏳ After solving CAPTCHA, press ENTER to continue...")
-            time.sleep(3)
 
-            if self.verify_login():
+            self.driver.get(CHAT_URL)
+            if self.wait_for_session() == 'ready':
                 self.save_cookies()
                 return True
 
@@ -436,65 +597,122 @@ class FacebookMessenger:
             logger.error(f"Failed to get bot name: {str(e)}")
             return False
 
-    def login(self):
-        """Robust login handler combining cookie and automated login."""
-        try:
-            options = uc.ChromeOptions()
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            
+    def launch_browser(self):
+        """Start Chrome on the persistent profile so the session survives restarts."""
+        options = uc.ChromeOptions()
+        options.add_argument("--disable-blink-features=AutomationControlled")
+
+        if HEADLESS_MODE:
+            options.add_argument('--headless=new')
+            options.add_argument('--window-size=1280,900' if LEAN_BROWSER else '--window-size=1920,1080')
+        else:
+            options.add_argument("--start-maximized")
+
+        if LEAN_BROWSER:
+            for arg in LEAN_CHROME_ARGS:
+                options.add_argument(arg)
             if HEADLESS_MODE:
-                options.add_argument('--headless=new')
-                options.add_argument('--window-size=1920,1080')
-            else:
-                options.add_argument("--start-maximized")
-            
-            try:
-                self.driver = uc.Chrome(options=options)
-            except Exception as e:
-                if "This version of ChromeDriver only supports Chrome version" in str(e):
-                    import re
-                    # Extract the required and current Chrome versions from the error message
-                    match = re.search(r'only supports Chrome version (\d+).*Current browser version is (\d+)', str(e))
-                    if match:
-                        required_ver = match.group(1)
-                        current_ver = match.group(2)
-                        error_msg = (
-                            f"❌ Chrome version mismatch detected!\n"
-                            f"  • Your Chrome version: {current_ver}\n"
-                            f"  • Required Chrome version: {required_ver}\n\n"
-                            "Please update your Chrome browser to the latest version:\n"
-                            "1. Open Chrome\n"
-                            "2. Click the three dots (⋮) in the top-right corner\n"
-                            "3. Go to Help > About Google Chrome\n"
-                            "4. Let it update if an update is available\n\n"
-                            "If the issue persists, you can manually download the matching ChromeDriver from:\n"
-                            "https://chromedriver.chromium.org/downloads"
-                        )
-                        logger.error(error_msg)
-                        raise Exception(error_msg) from e
-                # Re-raise the original exception if it's not a version mismatch
-                raise
-
-            if self.try_cookie_login():
-                return True
+                for arg in LEAN_HEADLESS_ARGS:
+                    options.add_argument(arg)
+            options.add_experimental_option("prefs", LEAN_PREFS)
 
-            logger.info("🔁 No valid cookies, trying automated login")
+        profile_dir = os.path.abspath(BROWSER_PROFILE_DIR) if BROWSER_PROFILE_DIR else None
 
-            # 🚨 Close the old driver and reopen for fresh login
-            self.driver.quit()
+        try:
+            driver = uc.Chrome(options=options, user_data_dir=profile_dir)
+            if LEAN_BROWSER:
+                self.block_heavy_requests(driver)
+            return driver
+        except Exception as e:
+            if "This version of ChromeDriver only supports Chrome version" in str(e):
+                import re
+                # Extract the required and current Chrome versions from the error message
+                match = re.search(r'only supports Chrome version (\d+).*Current browser version is (\d+)', str(e))
+                if match:
+                    required_ver = match.group(1)
+                    current_ver = match.group(2)
+                    error_msg = (
+                        f"❌ Chrome version mismatch detected!\n"
+                        f"  • Your Chrome version: {current_ver}\n"
+                        f"  • Required Chrome version: {required_ver}\n\n"
+                        "Please update your Chrome browser to the latest version:\n"
+                        "1. Open Chrome\n"
+                        "2. Click the three dots (⋮) in the top-right corner\n"
+                        "3. Go to Help > About Google Chrome\n"
+                        "4. Let it update if an update is available\n\n"
+                        "If the issue persists, you can manually download the matching ChromeDriver from:\n"
+                        "https://chromedriver.chromium.org/downloads"
+                    )
+                    logger.error(error_msg)
+                    raise Exception(error_msg) from e
+            # Re-raise the original exception if it's not a version mismatch
+            raise
 
-            options = uc.ChromeOptions()
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            if HEADLESS_MODE:
-                options.add_argument('--headless=new')
-                options.add_argument('--window-size=1920,1080')
-            else:
-                options.add_argument("--start-maximized")
-            self.driver = uc.Chrome(options=options)
+    def block_heavy_requests(self, driver):
+        """Drop image, media and font requests at the network layer via DevTools"""
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+            logger.info(f"🪶 Lean mode: blocking {len(LEAN_BLOCKED_URLS)} URL patterns")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not enable request blocking: {e}")
 
-            if self.automated_login():
+    def page_metrics(self):
+        """Load time, transferred bytes and JS heap of the current page"""
+        try:
+            return self.driver.execute_script(PAGE_METRICS_SCRIPT) or {}
+        except Exception as e:
+            logger.debug(f"Could not read page metrics: {e}")
+            return {}
+
+    def log_page_metrics(self):
+        metrics = self.page_metrics()
+        if not metrics:
+            return metrics
+        heap = metrics.get('js_heap_bytes')
+        heap_text = f"{heap / 1048576:.0f}MB" if heap else "n/a"
+        logger.info(
+            f"📊 Chat page ({'lean' if LEAN_BROWSER else 'full'} mode): load {metrics.get('load_ms')}ms, "
+            f"{metrics.get('resources')} resources / {metrics.get('transfer_bytes', 0) / 1024:.0f}KB, "
+            f"JS heap {heap_text}"
+        )
+        return metrics
+
+    def login(self):
+        """
+        Bring the browser to a logged-in group chat.
+
+        Chrome is launched at most once; re-logins reuse the running browser.
+        The profile directory normally still holds the session, so the common
+        path is a single navigation straight to the chat. Saved cookies and
+        then automated login are only tried when the profile is logged out.
+        """
+        started = time.perf_counter()
+        try:
+            if self.driver is None:
+                self.driver = self.launch_browser()
+                logger.info(f"🚀 Browser launched in {time.perf_counter() - started:.1f}s")
+
+            self.driver.get(CHAT_URL)
+            method = "profile session"
+
+            if self.wait_for_session() != 'ready':
+                if self.try_cookie_login():
+                    method = "saved cookies"
+                else:
+                    logger.info("🔁 No valid session, trying automated login")
+                    if not self.automated_login():
+                        return False
+                    method = "automated login"
+
+            # Self-message filtering needs the name however the session was restored
+            if self.bot_name is None:
                 self.get_bot_name()
-                return True
+
+            self.startup_seconds = time.perf_counter() - started
+            logger.info(f"⏱️ Ready in {self.startup_seconds:.1f}s via {method}")
+            self.log_page_metrics()
+            return True
 
         except Exception as e:
             logger.error(f"❌ Critical login failure: {str(e)}")
@@ -503,6 +721,7 @@ class FacebookMessenger:
                     self.driver.quit()
                 except:
                     pass
+                self.driver = None
             return False
 
     def get_latest_messages(self, fb_gc_id=None, limit=20):
@@ -514,7 +733,6 @@ class FacebookMessenger:
         Returns:
             List of unprocessed command messages from users (not from the bot itself)
         """
-        messages = []
         try:
             fb_gc_id = str(fb_gc_id) if fb_gc_id is not None else None
             if not fb_gc_id:
@@ -525,264 +743,186 @@ class FacebookMessenger:
             try:
                 if f"messages/t/{fb_gc_id}" not in self.driver.current_url:
                     self.driver.get(f"https://www.facebook.com/messages/t/{fb_gc_id}")
-                    time.sleep(3)  # Wait for page load
-
-                # Wait for chat container and scroll to load messages
-                chat_container = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//div[@role='main']"))
-                )
-                # Scroll to load more messages
-                self.driver.execute_script("arguments[0].scrollTop = 0", chat_container)
-                time.sleep(1)
+                    WebDriverWait(self.driver, 10).until(
+                        EC.presence_of_element_located((By.XPATH, "//div[@role='main']"))
+                    )
             except Exception as e:
                 logger.error(f"Failed to load chat: {str(e)}")
                 return []
 
-            # Get all message elements
+            # One round-trip: drain rows captured by the in-page MutationObserver
             try:
-                message_elements = WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_all_elements_located((
-                        By.XPATH, 
-                        "//div[@role='row' and .//div[@dir='auto']]"
-                    ))
-                )
-                message_elements = message_elements[-limit:]  # Only check most recent messages
-                logger.debug(f"Found {len(message_elements)} message elements to process")
-
-                # Process messages from newest to oldest
-                for element in reversed(message_elements):
-                    if len(messages) >= 5:  # Limit to 5 new commands per check
-                        break
-
-                    try:
-                        # Get message text
-                        message_div = element.find_element(By.XPATH, ".//div[@dir='auto']")
-                        message_text = message_div.text.strip()
-                        
-                        # Only process commands (messages starting with '!')
-                        if not message_text or not message_text.startswith('!'):
-                            continue
-
-                        # Get sender name - try multiple approaches
-                        sender = None
-                        sender_elements = []
-                        
-                        # Try different XPath patterns to find the sender
-                        xpath_patterns = [
-                            ".//span[contains(@class, 'x1lliihq') or contains(@class, 'x1plvlek')]",
-                            ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]//span//span//span",
-                            ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]//span",
-                            ".//a[contains(@href, 'profile.php') or contains(@href, '/messages/t/')]",
-                            ".//span[contains(@class, 'x1s688f')]//span//span"
-                        ]
-                        
-                        for xpath in xpath_patterns:
-                            try:
-                                sender_elements = element.find_elements(By.XPATH, xpath)
-                                if sender_elements:
-                                    sender = sender_elements[0].text.strip()
-                                    if sender and len(sender) > 1:  # Ensure it's a valid name
-                                        break
-                            except:
-                                continue
-                        
-                        if not sender:
-                            logger.debug("Could not determine sender for message")
-                            continue
-                            
-                        # Clean up sender name
-                        sender = sender.split('\n')[0].strip()
-                        
-                        # Skip if we can't determine a valid sender
-                        if not sender or len(sender) < 2:
-                            logger.debug(f"Skipping message with invalid sender: {sender}")
-                            continue
-                            
-                        # Skip messages from the bot itself
-                        if self.bot_name and sender.lower() == self.bot_name.lower():
-                            logger.debug(f"Skipping message from self (bot: {self.bot_name})")
-                            continue
-                            
-                        # Skip system messages and notifications
-                        skip_terms = [
-                            'facebook', 'messenger', 'notification', 'message',
-                            'you and', 'liked', 'reacted', 'shared', 'group',
-                            'clash of clans', 'war', 'battle', 'attack',
-                            'unknown', 'system', 'admin', 'joined', 'left',
-                            'created', 'poll', 'event', 'call', 'video', 'photo'
-                        ]
-                        
-                        if any(term in sender.lower() for term in skip_terms):
-                            logger.debug(f"Skipping system message from: {sender}")
-                            continue
-                            
-                        # Generate a message ID using content hash
-                        message_id = hashlib.md5(
-                            f"{fb_gc_id}_{sender}_{message_text}".encode()
-                        ).hexdigest()
-                        
-                        # Check if we've already processed this message
-                        if not self.is_message_processed(message_id):
-                            self.mark_message_as_processed(message_id, sender, message_text)
-                            messages.append({
-                                'id': message_id,
-                                'sender': sender,
-                                'message': message_text
-                            })
-                            logger.info(f"New command from {sender}: {message_text}")
-                            
-                    except Exception as msg_error:
-                        logger.debug(f"Error processing message element: {str(msg_error)}")
-                        continue
-
+                rows = self.driver.execute_script(DRAIN_OBSERVER_SCRIPT)
+                if rows is None:
+                    # Observer missing (first poll or page reloaded): install it.
+                    # It returns the most recent existing rows so nothing is skipped.
+                    logger.debug("Installing chat MutationObserver")
+                    rows = self.driver.execute_script(INSTALL_OBSERVER_SCRIPT, limit)
             except Exception as e:
-                logger.error(f"Error finding message elements: {str(e)}")
-                return []
+                # e.g. a detached node or a navigation in the middle of the poll
+                logger.debug(f"Chat observer failed: {e}")
+                rows = None
 
-            return messages
+            if rows is None:
+                logger.debug("Chat observer unavailable, extracting rows in bulk instead")
+                rows = self.extract_message_rows(limit)
+
+            return self.filter_command_rows(rows, fb_gc_id)
 
         except Exception as e:
             logger.error(f"Failed to get latest messages: {str(e)}")
             return []
 
-    def parse_command(self, text, sender=None):
-        """
-        Parse and respond to known commands
-        
-        Args:
-            text: The message text to parse
-            sender: Optional sender name for logging
-            
-        Returns:
-            str: Response message or None if no command was handled
-        """
-        if not text or not text.startswith('!'):
-            logger.debug(f"Not a command: {text}")
-            return None
-            
-        logger.info(f"Processing command from {sender or 'unknown'}: {text}")
-        
+    def extract_message_rows(self, limit=20):
+        """Read the last rows with a single execute_script call (falls back to a per-row scan)"""
         try:
-            # First try the new command handler
-            response = self.handle_command(text, sender)
-            if response is not None:
-                logger.debug(f"Command handled by handle_command: {text}")
-                return response
-                
-            # Fall back to legacy command handling
-            text_lower = text.lower()
-            
-            if text_lower.startswith("!hey") or "hey bot" in text_lower:
-                return "👋 Hello there! Type !help to see what I can do!"
-                
-            elif text_lower.startswith("!status"):
-                return "🟢 I'm online and ready to help! Type !help for options."
-                
-            elif text_lower.startswith("!joke"):
-                return random.choice([
-                    # 👨‍💻 Programming Jokes
-                    "Why don't programmers like nature? It has too many bugs.",
-                    "Why do Java developers wear glasses? Because they don't C#.",
-                    "How do you comfort a JavaScript bug? You console it.",
-                    "I told my computer I needed a break, and now it won't stop sending me KitKat ads.",
-                    "Programmer's diet: food() && sleep() && code();",
-
-                    # 🏰 Clash of Clans Jokes
-                    "Why did the Barbarian go to school? To improve his *clash*ifications.",
-                    "Why did the Archer break up with the Giant? She needed space... 5 tiles, to be exact.",
-                    "Why did the Clan Castle refuse to talk? It didn't want to *clash*.",
-                    "What's a Wall Breaker's favorite song? 'We Will Rock You.'",
-                    "Why was the Goblin always broke? He kept raiding the wrong storages.",
-                    "Why did the Witch get kicked from the clan? Too many *skeletons* in her closet.",
-                    "What do you call a Hog Rider who can't ride? Just a guy with a hammer.",
-                    "Why did the P.E.K.K.A bring a pencil to battle? To draw first blood.",
-                    "Why don't Clashers play hide and seek? Because you can't hide from an Eagle Artillery.",
-                    "Why did the Town Hall blush? Because it saw the Archer Queen.",
-                    "How do Clashers stay cool in battle? They chill near an Ice Golem.",
-                    "Why was the Builder always calm? Because he knew how to constructively handle problems.",
-                    "What's the Archer Queen's favorite movie? 'Legolas: A True Story'.",
-                    "Why did the Lava Hound fail math? It always split during division.",
-                ])
-                
-            elif text_lower.startswith("!info"):
-                return """🤖 *Bot Information* 🤖
+            rows = self.driver.execute_script(BULK_EXTRACT_SCRIPT, limit)
+            if rows is not None:
+                return rows
+        except Exception as e:
+            logger.debug(f"Bulk row extraction failed: {e}")
+        return self.scan_message_rows(limit)
+
+    def benchmark_scrape(self, limit=20, rounds=5):
+        """Time the per-row WebDriver scan against the bulk extractor on the current chat"""
+        results = {}
+        for name, scrape in (('per_row', self.scan_message_rows), ('bulk', self.extract_message_rows)):
+            durations = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                rows = scrape(limit)
+                durations.append(time.perf_counter() - started)
+            results[name] = {
+                'rows': len(rows),
+                'best': min(durations),
+                'mean': sum(durations) / len(durations),
+            }
+            logger.info(
+                f"⏱️ Scrape [{name}]: {results[name]['rows']} rows, "
+                f"best {results[name]['best'] * 1000:.0f}ms, mean {results[name]['mean'] * 1000:.0f}ms"
+            )
+        return results
 
-*Version*: 1.0.0  
-*Last Updated*: 2025-04-17
+    def scan_message_rows(self, limit=20):
+        """Legacy scrape: read the visible rows one WebDriver call at a time"""
+        rows = []
+        try:
+            chat_container = WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, "//div[@role='main']"))
+            )
+            # Scroll to load more messages
+            self.driver.execute_script("arguments[0].scrollTop = 0", chat_container)
+
+            message_elements = WebDriverWait(self.driver, 5).until(
+                EC.presence_of_all_elements_located((
+                    By.XPATH, 
+                    "//div[@role='row' and .//div[@dir='auto']]"
+                ))
+            )
+            message_elements = message_elements[-limit:]  # Only check most recent messages
+            logger.debug(f"Found {len(message_elements)} message elements to process")
 
-*Features*:  
-✅ Facebook Messenger automation  
-✅ Command processing (!help for list)  
-✅ Message tracking  
-✅ Automated responses  
-✅ War monitoring
-✅ Kudos system
+            for element in message_elements:
+                try:
+                    message_div = element.find_element(By.XPATH, ".//div[@dir='auto']")
+                    message_text = message_div.text.strip()
+                    if not message_text:
+                        continue
 
-*Technical*:  
-🐍 Python 3.10+  
-🌐 Selenium WebDriver  
-💾 SQLite database  
-⏰ 24/7 operation  
+                    # Only commands need a sender, so skip the sender lookups otherwise
+                    senders = []
+                    if message_text.startswith('!'):
+                        for xpath in SENDER_XPATHS:
+                            try:
+                                sender_elements = element.find_elements(By.XPATH, xpath)
+                                senders.append(sender_elements[0].text.strip() if sender_elements else None)
+                            except Exception:
+                                senders.append(None)
 
-*Maintained and Developed By*:  
-👤 Joma  
+                    rows.append({'id': None, 'senders': senders, 'text': message_text, 'ts': None})
+                except Exception as msg_error:
+                    logger.debug(f"Error processing message element: {str(msg_error)}")
+                    continue
 
-Type `!help` for a list of commands"""
+        except Exception as e:
+            logger.error(f"Error finding message elements: {str(e)}")
 
-            elif text_lower.startswith("!kudos"):
-                try:
-                    # Extract CoC name after command
-                    coc_name = text.split(maxsplit=1)[1].strip()
-                    if self.give_kudos(coc_name):
-                        return f"🎉 Kudos awarded to {coc_name}! 🎉"
-                    return "❌ Failed to record kudos. Please try again later."
-                except IndexError:
-                    return "❌ Usage: !kudos [InGameName]"
-
-            elif text_lower.startswith("!seekudos"):
-                try:
-                    # Default to total leaderboard
-                    period = "total"
-                    
-                    # Check for weekly request
-                    if "weekly" in text.lower():
-                        period = "weekly"
-                        
-                    leaderboard = self.show_kudos(period=period, limit=15)  # Show top 15
-                    if leaderboard:
-                        return f"🏆 Top 15 Kudos ({period.capitalize()}) 🏆\n\n{leaderboard}"
-                    return "No kudos data available yet."
-                    
-                except Exception as e:
-                    logger.error(f"Kudos command error: {e}")
-                    return "❌ Usage: !seekudos [weekly]"
+        return rows
 
-            elif text_lower.startswith("!help"):
-                return """🤖 *Available Commands* 🤖
+    def pick_sender(self, candidates):
+        """Apply the sender heuristics to the per-XPath candidates of one row"""
+        sender = None
+        for candidate in candidates or []:
+            if candidate:
+                sender = candidate
+                if len(sender) > 1:  # Ensure it's a valid name
+                    break
+        return sender
 
-*General Commands*:
-`!help` - Show this help message
-`!info` - Show bot information
-`!status` - Check if bot is online
-`!joke` - Get a random joke
+    def filter_command_rows(self, rows, fb_gc_id):
+        """
+        Turn raw chat rows ({id, senders, text, ts}, oldest first) into new commands.
+        Applies the sender/skip rules and the processed-message dedup.
+        """
+        messages = []
 
-*Kudos System*:
-`!kudos @User` - Give kudos to a user
-`!seekudos [weekly]` - Show kudos leaderboard
+        # Oldest first, so replies go out in the order the commands were sent
+        for row in rows or []:
+            message_text = (row.get('text') or '').strip()
 
-*War Commands*:
-`!warstatus` - Check current war status
-`!cwl` - Show CWL information
+            # Only process commands (messages starting with '!')
+            if not message_text or not message_text.startswith('!'):
+                continue
 
-Type any command with `help` for more info (e.g., `!kudos help`)"""
+            sender = self.pick_sender(row.get('senders'))
+            if not sender:
+                logger.debug("Could not determine sender for message")
+                continue
+                
+            # Clean up sender name
+            sender = sender.split('\n')[0].strip()
             
-            # If we get here, no command was matched
-            logger.debug(f"No command matched for: {text}")
-            return None
+            # Skip if we can't determine a valid sender
+            if not sender or len(sender) < 2:
+                logger.debug(f"Skipping message with invalid sender: {sender}")
+                continue
+                
+            # Skip messages from the bot itself
+            if self.bot_name and sender.lower() == self.bot_name.lower():
+                logger.debug(f"Skipping message from self (bot: {self.bot_name})")
+                continue
+                
+            if any(term in sender.lower() for term in SYSTEM_SENDER_TERMS):
+                logger.debug(f"Skipping system message from: {sender}")
+                continue
+                
+            # Generate a message ID using content hash
+            message_id = hashlib.md5(
+                f"{fb_gc_id}_{sender}_{message_text}".encode()
+            ).hexdigest()
             
-        except Exception as e:
-            logger.error(f"Error in parse_command: {str(e)}")
-            return f"❌ An error occurred while processing your command: {str(e)}"
+            # Check if we've already processed this message
+            if not self.is_message_processed(message_id):
+                self.mark_message_as_processed(message_id, sender, message_text)
+                messages.append({
+                    'id': message_id,
+                    'dom_id': row.get('id'),
+                    'sender': sender,
+                    'message': message_text,
+                    'seen_at': row.get('ts')
+                })
+                logger.info(f"New command from {sender}: {message_text}")
+
+        return messages
+
+    def respond_to_command(self, message_text, sender_name, chat="default"):
+        """
+        Build the reply for one command (blocking: run it off the event loop).
+        Returns None when the command is throttled or folded into an earlier reply.
+        """
+        if not self.throttle.admit(sender_name, chat):
+            return None
+        return registry.dispatch(self, message_text, sender_name, fold=self.throttle.fold)
 
     @staticmethod
     def generate_message_id(sender, message, timestamp):
@@ -795,14 +935,65 @@ Type any command with `help` for more info (e.g., `!kudos help`)"""
             # Fallback to a simple hash if there's an error
             return hashlib.md5(f"{time.time()}".encode()).hexdigest()
 
-    async def listen_for_commands(self, fb_gc_id=None):
-        """Main loop to listen for and process commands"""
-        if not fb_gc_id:
-            logger.error("No Facebook Group Chat ID provided")
-            return
+    async def evaluate_commands(self, messages, chat="default"):
+        """
+        Evaluate all pending commands of one poll. Reads run together, each in
+        a worker thread (most hit SQLite); a state-changing command (a kudos
+        award) runs alone, after everything before it and before anything
+        after it, so every reply reflects the messages sent before it.
+        Replies come back in message order, None where a command was
+        throttled, folded or failed.
+        """
+        async def evaluate(sender, text):
+            logger.info(f"Processing command from {sender}: {text}")
+            with span('command', command=text.split()[0].lower() if text else ''):
+                return await asyncio.to_thread(self.respond_to_command, text, sender, chat)
+
+        results = []
+        reads = []
+        for msg in messages:
+            sender = msg.get('sender', 'Unknown')
+            text = msg.get('message', '').strip()
+            if not registry.writes(text):
+                reads.append(evaluate(sender, text))
+                continue
+            results.extend(await asyncio.gather(*reads, return_exceptions=True))
+            results.extend(await asyncio.gather(evaluate(sender, text), return_exceptions=True))
+            reads = []
+        results.extend(await asyncio.gather(*reads, return_exceptions=True))
+
+        replies = []
+        for msg, result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing message {msg.get('message')!r}: {result}")
+                result = None
+            replies.append(result)
+        return replies
+
+    def batch_replies(self, replies, max_chars=REPLY_BATCH_MAX_CHARS):
+        """Join replies, in order, into as few messages as fit in max_chars each"""
+        batches = []
+        current = ""
+        for reply in replies:
+            if not reply:
+                continue
+            if current and len(current) + len(REPLY_SEPARATOR) + len(reply) > max_chars:
+                batches.append(current)
+                current = ""
+            current = f"{current}{REPLY_SEPARATOR}{reply}" if current else reply
+        if current:
+            batches.append(current)
+        return batches
+
+    async def listen_for_commands(self, transport, outbound=None):
+        """
+        Main loop to listen for and process commands
 
-        fb_gc_id = str(fb_gc_id)
-        logger.info(f"👂 Starting command listener for group: {fb_gc_id}")
+        Args:
+            transport: Transport the commands come from (the group chat, console, ...)
+            outbound: OutboundQueue for replies (sent through the transport if not given)
+        """
+        logger.info(f"👂 Starting command listener on {transport.name} transport")
 
         # Initialize last processed message ID
         last_processed_id = None
@@ -811,108 +1002,62 @@ Type any command with `help` for more info (e.g., `!kudos help`)"""
         max_errors = 5
 
         try:
-            # Navigate to the chat
-            self.driver.get(f"https://www.facebook.com/messages/t/{fb_gc_id}")
-            time.sleep(3)
-            
             while True:
                 try:
-                    # Periodically clean up old messages (every hour)
+                    # Periodic database maintenance (off the event loop)
                     current_time = time.time()
-                    if current_time - last_cleanup > 3600:  # 1 hour
-                        self.cleanup_old_messages(hours=24)  # Keep messages for 24 hours
+                    if current_time - last_cleanup > RETENTION_INTERVAL:
+                        await asyncio.to_thread(self.cleanup_old_messages, MESSAGE_RETENTION_MINUTES)
                         last_cleanup = current_time
 
                     # Get new messages
-                    messages = await asyncio.to_thread(self.get_latest_messages, fb_gc_id)
-                    
+                    metrics.poll('listener', transport.poll_interval)
+                    with SCRAPE_LATENCY.time(transport=transport.name), span('receive', transport=transport.name):
+                        messages = await transport.receive()
+
                     if messages:
-                        for msg in messages:
-                            try:
-                                # Skip if we've already processed this message
-                                if last_processed_id and msg.get('id') == last_processed_id:
-                                    continue
-
-                                logger.info(f"Processing message from {msg.get('sender')}: {msg.get('message')}")
-
-                                # Get message text and clean it up
-                                message_text = msg.get('message', '').strip()
-                                sender_name = msg.get('sender', 'Unknown')
-                                
-                                # Skip empty messages
-                                if not message_text:
-                                    continue
-                                    
-                                logger.info(f"Processing command from {sender_name}: {message_text}")
-                                
-                                # Handle the command and get response
-                                response = None
-                                
-                                # First try the handle_command method (new style)
-                                if hasattr(self, 'handle_command'):
-                                    response = self.handle_command(message_text, sender_name)
-                                
-                                # If no response, try the parse_command method (legacy)
-                                if response is None:
-                                    response = self.parse_command(message_text, sender_name)
-                                    
-                                # If still no response and it's a command (starts with !), show help
-                                if response is None and message_text.startswith('!'):
-                                    response = "❌ Unknown command. Type `!help` for a list of available commands."
-
-                                # If we got a response, send it back to the group
-                                if response:
-                                    logger.info(f"Sending response to {msg.get('sender')}")
-                                    success = await asyncio.to_thread(
-                                        self.send_message,
-                                        response
-                                    )
-
-                                    if success:
-                                        logger.info(f"✅ Responded to command from {msg.get('sender')}")
-                                    else:
-                                        logger.warning(f"Failed to send response to {msg.get('sender')}")
-
-                                # Update last processed message ID
-                                last_processed_id = msg.get('id')
-
-                                # Small delay between processing messages
-                                await asyncio.sleep(0.5)
-                                
-                            except Exception as e:
-                                error_count += 1
-                                logger.error(f"Error processing message: {str(e)}", exc_info=True)
-                                if error_count > max_errors:
-                                    logger.error("⚠️ Too many errors, restarting command listener...")
-                                    try:
-                                        self.driver.refresh()
-                                        time.sleep(5)
-                                        error_count = 0
-                                    except Exception as refresh_error:
-                                        logger.error(f"Failed to refresh page: {str(refresh_error)}")
-                                        await asyncio.sleep(30)  # Wait longer if refresh fails
-                                await asyncio.sleep(5)  # Wait before retrying on error
-                                continue
-                    
+                        # Skip if we've already processed this message
+                        messages = [
+                            msg for msg in messages
+                            if (msg.get('message') or '').strip()
+                            and not (last_processed_id and msg.get('id') == last_processed_id)
+                        ]
+
+                    if messages:
+                        with span('commands', count=len(messages)):
+                            started = time.perf_counter()
+                            replies = await self.evaluate_commands(messages, transport.chat_id)
+                            batches = self.batch_replies(replies)
+
+                            for batch in batches:
+                                if outbound is not None:
+                                    outbound.enqueue(batch, PRIORITY_REPLY)
+                                elif not await transport.send(batch):
+                                    logger.warning("Failed to send command replies")
+
+                            logger.info(
+                                f"Handled {len(messages)} commands in {(time.perf_counter() - started) * 1000:.0f}ms, "
+                                f"{sum(1 for reply in replies if reply)} replies in {len(batches)} sends"
+                            )
+                        last_processed_id = messages[-1].get('id')
+
                     # Reset error count on successful iteration
                     error_count = 0
                     
                     # Short sleep to prevent high CPU usage
-                    await asyncio.sleep(2)
-                    
-                    # Refresh the page occasionally to prevent staleness
-                    if random.random() < 0.1:  # ~10% chance on each iteration
-                        try:
-                            self.driver.refresh()
-                            time.sleep(2)
-                        except Exception as e:
-                            logger.error(f"Error refreshing page: {str(e)}")
+                    if not messages:
+                        await asyncio.sleep(transport.poll_interval)
                             
                 except Exception as e:
                     error_count += 1
                     logger.error(f"Error in command loop: {str(e)}", exc_info=True)
                     if error_count > max_errors:
-                        logger.error("Multiple errors occurred, waiting before retrying...")
+                        logger.error("⚠️ Too many errors, resetting the transport...")
+                        try:
+                            await transport.reset()
+                            error_count = 0
+                        except Exception as reset_error:
+                            logger.error(f"Failed to reset transport: {str(reset_error)}")
                         await asyncio.sleep(10)
                     else:
                         await asyncio.sleep(2)
@@ -926,15 +1071,72 @@ Type any command with `help` for more info (e.g., `!kudos help`)"""
 
 
 
-    def escape_xpath_text(self, text):
-        """Safely escape text for use inside an XPath expression."""
-        if "'" in text and '"' in text:
-            parts = text.split("'")
-            return "concat('" + "', \"'\", '".join(parts) + "')"
-        elif "'" in text:
-            return f'"{text}"'
-        else:
-            return f"'{text}'"
+    def confirmation_text(self, message):
+        """First line with words in it, trimmed, for the send watcher to match (it ignores emoji)"""
+        for line in message.splitlines():
+            if any(char.isalnum() for char in line):
+                return line.strip()[:60]
+        return message.strip()[:60]
+
+    def find_composer(self):
+        """Return the chat composer if it is already rendered (no waiting)"""
+        elements = self.driver.find_elements(By.XPATH, COMPOSER_XPATH)
+        return elements[0] if elements else None
+
+    def is_session_expired(self):
+        """Cheap check: Facebook redirects to a login/checkpoint URL when the session is gone"""
+        current_url = self.driver.current_url
+        return any(marker in current_url for marker in LOGGED_OUT_URL_MARKERS)
+
+    def open_chat(self, timings):
+        """
+        Return the group chat composer, reusing the already-loaded chat view.
+        Only navigates when the composer is missing, and only re-logs in when
+        the session has actually expired.
+        """
+        started = time.perf_counter()
+        composer = None
+
+        if f"messages/t/{FB_GC_ID}" in self.driver.current_url:
+            composer = self.find_composer()
+
+        if composer is None:
+            logger.info("🔄 Chat view not ready, loading group chat...")
+            composer = self.navigate_to_chat()
+
+            if composer is None and self.is_session_expired():
+                logger.error("❌ Facebook session expired. Attempting to log in...")
+                relogin_started = time.perf_counter()
+                if not self.login():
+                    raise Exception("Failed to log in")
+                if not self.save_cookies():
+                    logger.warning("⚠️ Failed to save session cookies.")
+                timings['relogin'] = time.perf_counter() - relogin_started
+                composer = self.find_composer() or self.navigate_to_chat()
+
+            if composer is None:
+                raise Exception("Message composer not found")
+
+        timings['open_chat'] = time.perf_counter() - started
+        return composer
+
+    def navigate_to_chat(self, timeout=20):
+        """Load the group chat and wait for the composer instead of sleeping"""
+        self.driver.get(CHAT_URL)
+        try:
+            return WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.XPATH, COMPOSER_XPATH))
+            )
+        except TimeoutException:
+            return None
+
+    def refresh_chat(self):
+        """Reload the current page after listener errors (runs on the browser thread)"""
+        if not self.driver:
+            logger.warning("⚠️ No browser to refresh")
+            return False
+        self.driver.refresh()
+        return True
 
     def send_message(self, message):
         """Send message to configured Facebook group chat"""
@@ -944,70 +1146,56 @@ Type any command with `help` for more info (e.g., `!kudos help`)"""
             logger.error("❌ WebDriver not initialized")
             return False
 
-        # Verify if the bot is logged in before proceeding
-        if not self.verify_login():
-            logger.error("❌ Not logged in to Facebook. Attempting to log in...")
-
-            # Attempt login if not logged in
-            if not self.login():
-                logger.error("❌ Failed to log in.")
-                return False
-
-            # Once logged in, save the session cookies
-            if not self.save_cookies():
-                logger.warning("⚠️ Failed to save session cookies.")
+        timings = {}
+        started = time.perf_counter()
 
         try:
-            self.driver.get(f"https://www.facebook.com/messages/t/{FB_GC_ID}")
-
-            # Wait for the page to load fully
-            WebDriverWait(self.driver, 20).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            time.sleep(random.uniform(2, 4))  # Small buffer
-
-            # Scroll to bottom to make sure everything is visible
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-            # Wait for the message box to be clickable
-            message_box = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//div[@role='textbox']"))
-            )
+            with span('open_chat'):
+                message_box = self.open_chat(timings)
 
             # Use JavaScript to focus the element (helps if it’s not interactable normally)
             self.driver.execute_script("arguments[0].focus();", message_box)
 
-            # Type the message using your human_type method
-            self.human_type(message_box, message)
+            # Type the message using the configured typing profile
+            typing_started = time.perf_counter()
+            with span('type', profile=TYPING_PROFILE, chars=len(message)):
+                self.type_message(message_box, message)
+            timings['type'] = time.perf_counter() - typing_started
+            self.record_typing_time(TYPING_PROFILE, timings['type'])
 
-            time.sleep(random.uniform(0.5, 1.5))  # Wait before sending
+            # Arm the watcher for our own row before it can appear
+            watched = self.driver.execute_script(WATCH_SEND_SCRIPT, self.confirmation_text(message))
 
             # Press Enter to send the message
             message_box.send_keys(Keys.RETURN)
 
-            # Verify if any line of the message is visible in chat (optional, can be flaky)
+            confirm_started = time.perf_counter()
             try:
-                lines = message.splitlines()
-                for line in lines:
-                    if not line.strip():
-                        continue  # Skip empty lines
-                    try:
-                        safe_text = self.escape_xpath_text(line.strip())
-                        WebDriverWait(self.driver, 5).until(
-                            EC.presence_of_element_located((By.XPATH, f"//*[contains(text(), {safe_text})]"))
-                        )
-                        logger.info(f"✅ Verified message line in chat: {line.strip()}")
-                        return True
-                    except Exception:
-                        continue
+                confirmed = False
+                if watched:
+                    self.driver.set_script_timeout(SEND_CONFIRM_TIMEOUT + 5)
+                    with span('confirm'):
+                        confirmed = self.driver.execute_async_script(AWAIT_SEND_SCRIPT, int(SEND_CONFIRM_TIMEOUT * 1000))
+
+                if confirmed:
+                    logger.info("✅ Verified message in chat")
+                    return True
 
-                logger.warning("⚠️ Could not verify any line from the message. It was likely still sent.")
-                return True
+                # Row not seen in time: an emptied composer still means Messenger took it
+                if not (message_box.text or '').strip():
+                    logger.warning("⚠️ Could not see the sent row, but the composer was cleared. It was likely still sent.")
+                    return True
+
+                logger.error("❌ Message still in the composer after pressing Enter")
+                return False
 
             except Exception as verify_error:
                 logger.warning(f"⚠️ Error during message verification: {verify_error}")
                 return True
 
+            finally:
+                timings['confirm'] = time.perf_counter() - confirm_started
+                self.record_send_timings(timings, started)
 
         except Exception as e:
             logger.error(f"❌ Failed to send message: {str(e)}")
@@ -1019,7 +1207,43 @@ Type any command with `help` for more info (e.g., `!kudos help`)"""
                 logger.error(f"Failed to take screenshot: {screenshot_err}")
             return False
 
+    def record_send_timings(self, timings, started):
+        """Keep and log the per-send latency breakdown"""
+        timings['total'] = time.perf_counter() - started
+        self.last_send_timings = timings
+        for stage, seconds in timings.items():
+            BROWSER_SEND_STAGE.observe(seconds, stage=stage)
+        breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if stage != 'total')
+        logger.info(f"📨 Send took {timings['total']:.2f}s [{TYPING_PROFILE}] ({breakdown})")
+
+    async def send(self, message, timeout=SEND_TIMEOUT):
+        """Send a message from async code through the browser actor"""
+        try:
+            return await self.browser.run(self.send_message, message, timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def recycle_browser(self):
+        """
+        Quit Chrome and start a fresh one on the same profile, back on the chat.
+        Runs on the browser thread, so no scrape or send can interleave.
+        """
+        logger.info("♻️ Recycling browser...")
+        self.save_cookies()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ Error quitting old browser: {e}")
+        self.driver = None
+
+        # login() relaunches on the persistent profile and lands on the chat
+        return self.login()
+
     def close(self):
-        """Clean up the driver"""
+        """Clean up the driver (on the browser thread) and stop the actor"""
         if self.driver:
-            self.driver.quit()
\ No newline at end of file
+            try:
+                self.browser.call(self.driver.quit, timeout=30)
+            except Exception as e:
+                logger.error(f"Failed to close browser: {e}")
+        self.browser.stop(timeout=5)
\ No newline at end of file
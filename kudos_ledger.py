@@ -0,0 +1,163 @@
+# kudos_ledger.py
+import time
+import sqlite3
+import logging
+from datetime import date, datetime, timedelta
+from config import TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('weekly', 'monthly', 'season')
+
+
+def init_ledger(cursor):
+    """Create the append-only kudos ledger and its daily/weekly buckets.
+
+    Buckets are keyed by local-date ordinals (date.toordinal()); weekly buckets
+    use the ordinal of the Monday that starts the week.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kudos_ledger (
+            award_id INTEGER PRIMARY KEY,
+            giver TEXT,
+            receiver TEXT NOT NULL,
+            awarded_at INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kudos_daily (
+            day INTEGER NOT NULL,
+            receiver TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, receiver)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kudos_weekly (
+            week INTEGER NOT NULL,
+            receiver TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (week, receiver)
+        ) WITHOUT ROWID
+    ''')
+
+
+def local_day(timestamp=None):
+    """Local-date ordinal for a unix timestamp (defaults to now)."""
+    if timestamp is None:
+        timestamp = time.time()
+    return datetime.fromtimestamp(timestamp, TIMEZONE).date().toordinal()
+
+
+def week_start(day):
+    """Ordinal of the Monday on or before the given day ordinal."""
+    return day - date.fromordinal(day).weekday()
+
+
+def record_award(cursor, receiver, giver=None, timestamp=None):
+    """Append one award and bump its daily and weekly buckets.
+
+    Runs on the caller's cursor so the award and the kudos totals commit together.
+    """
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    day = local_day(timestamp)
+    cursor.execute('''
+        INSERT INTO kudos_ledger (giver, receiver, awarded_at) VALUES (?, ?, ?)
+    ''', (giver, receiver, timestamp))
+    cursor.execute('''
+        INSERT INTO kudos_daily (day, receiver, count) VALUES (?, ?, 1)
+        ON CONFLICT(day, receiver) DO UPDATE SET count = count + 1
+    ''', (day, receiver))
+    cursor.execute('''
+        INSERT INTO kudos_weekly (week, receiver, count) VALUES (?, ?, 1)
+        ON CONFLICT(week, receiver) DO UPDATE SET count = count + 1
+    ''', (week_start(day), receiver))
+
+
+def period_window(period, today=None):
+    """Return the [start, end) day-ordinal window for a named period.
+
+    Seasons follow the Clash of Clans calendar and end on the last Monday of
+    the month.
+    """
+    today = today if today is not None else local_day()
+    current = date.fromordinal(today)
+
+    if period == 'weekly':
+        start = week_start(today)
+        return start, start + 7
+
+    if period == 'monthly':
+        first = current.replace(day=1)
+        next_first = (first + timedelta(days=32)).replace(day=1)
+        return first.toordinal(), next_first.toordinal()
+
+    if period == 'season':
+        def season_end(year, month):
+            next_first = (date(year, month, 1) + timedelta(days=32)).replace(day=1)
+            last_day = next_first - timedelta(days=1)
+            return (last_day - timedelta(days=last_day.weekday())).toordinal()
+
+        end = season_end(current.year, current.month)
+        if today >= end:
+            following = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+            return end, season_end(following.year, following.month)
+        previous = current.replace(day=1) - timedelta(days=1)
+        return season_end(previous.year, previous.month), end
+
+    raise ValueError(f"Unknown kudos period: {period}")
+
+
+def leaderboard(cursor, start, end, limit=10):
+    """Top receivers for the [start, end) day window.
+
+    Whole weeks inside the window come from kudos_weekly and the partial weeks
+    at either edge from kudos_daily, so the cost grows with the number of
+    buckets touched rather than the number of awards.
+    """
+    first_week = week_start(start + 6)
+    last_week = week_start(end)
+
+    if first_week < last_week:
+        cursor.execute('''
+            SELECT receiver, SUM(count) AS score FROM (
+                SELECT receiver, count FROM kudos_weekly WHERE week >= ? AND week < ?
+                UNION ALL
+                SELECT receiver, count FROM kudos_daily WHERE day >= ? AND day < ?
+                UNION ALL
+                SELECT receiver, count FROM kudos_daily WHERE day >= ? AND day < ?
+            )
+            GROUP BY receiver
+            ORDER BY score DESC, receiver
+            LIMIT ?
+        ''', (first_week, last_week, start, first_week, last_week, end, limit))
+    else:
+        cursor.execute('''
+            SELECT receiver, SUM(count) AS score
+            FROM kudos_daily
+            WHERE day >= ? AND day < ?
+            GROUP BY receiver
+            ORDER BY score DESC, receiver
+            LIMIT ?
+        ''', (start, end, limit))
+    return cursor.fetchall()
+
+
+def retire_weekly_column(cursor):
+    """Drop kudos.weekly_kudos and its index from older databases.
+
+    Weekly leaderboards are answered from kudos_weekly, so the column was a
+    second copy of the same count that had to be reset every Monday.
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_kudos_weekly")
+    cursor.execute("PRAGMA table_info(kudos)")
+    if 'weekly_kudos' not in [col[1] for col in cursor.fetchall()]:
+        return False
+    try:
+        cursor.execute("ALTER TABLE kudos DROP COLUMN weekly_kudos")
+    except sqlite3.OperationalError as e:
+        # SQLite before 3.35 cannot drop columns; the column is simply no longer used
+        logger.warning(f"Could not drop kudos.weekly_kudos: {e}")
+        return False
+    logger.info("Dropped kudos.weekly_kudos; weekly rankings come from kudos_weekly")
+    return True
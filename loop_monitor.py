@@ -0,0 +1,70 @@
+# loop_monitor.py
+import asyncio
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a short sleep wakes up.
+
+    Any synchronous browser or database call made on the loop shows up here
+    directly, so the p99/max values are the check that no task blocks
+    coc_monitor_loop, recent_attack or the listener.
+    """
+
+    def __init__(self, interval=0.1, warn_threshold=0.02, report_every=300, samples=3000):
+        """
+        Args:
+            interval: seconds between probes
+            warn_threshold: lag in seconds that gets logged as a warning
+            report_every: seconds between summary log lines
+            samples: number of recent probes kept for percentiles
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.report_every = report_every
+        self.samples = deque(maxlen=samples)
+        self.current = 0.0
+        self.max_lag = 0.0
+        self.over_threshold = 0
+
+    def stats(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'current': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0, 'over_threshold': 0}
+        return {
+            'current': self.current,
+            'p50': ordered[len(ordered) // 2],
+            'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            'max': self.max_lag,
+            'over_threshold': self.over_threshold,
+        }
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_report = time.monotonic()
+
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+
+            self.current = lag
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                self.over_threshold += 1
+                logger.warning(f"🐢 Event loop blocked for {lag * 1000:.0f}ms")
+
+            if time.monotonic() - last_report > self.report_every:
+                stats = self.stats()
+                logger.info(
+                    f"Event loop lag p50 {stats['p50'] * 1000:.1f}ms, p99 {stats['p99'] * 1000:.1f}ms, "
+                    f"max {stats['max'] * 1000:.1f}ms, {stats['over_threshold']} probes over "
+                    f"{self.warn_threshold * 1000:.0f}ms"
+                )
+                last_report = time.monotonic()
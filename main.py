@@ -1,63 +1,55 @@
-import asyncio
-import logging
-import sqlite3
-import random
-from datetime import datetime
-from coc_monitor import CocMonitor
-from fb_bot import FacebookMessenger
-from config import CHECK_INTERVAL, CLAN_TAG, FB_GC_ID
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-def init_db():
-    logger.info("Initializing database...")
-    conn = sqlite3.connect('war_status.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS war_state (
-            id INTEGER PRIMARY KEY,
-            state TEXT
-        )
-    ''')
-
-    # Ensure there is one row
-    c.execute('SELECT COUNT(*) FROM war_state')
-    count = c.fetchone()[0]
-    logger.info(f"Rows in war_state table: {count}")
-    if count == 0:
-        logger.info("Inserting default empty state...")
-        c.execute('INSERT INTO war_state (state) VALUES (?)', ('',))
-    conn.commit()
-    conn.close()
-    logger.info("Database initialized.\n")
-
-def init_attack_log_db():
-    logger.info("Initializing war_attacks.db for logging attacks...")
-    conn = sqlite3.connect('war_attacks.db')
-    c = conn.cursor()
-
-    # Create table for logging processed attacks
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS logged_attacks (
-            attacker_tag TEXT,
-            attacker_name TEXT,
-            defender_name TEXT,
-            destruction_percentage TEXT,
-            attack_order INTEGER,
-            opponent_clan TEXT,
-            PRIMARY KEY (attacker_tag, defender_name, attack_order)
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
-    logger.info("war_attacks.db initialized.\n")
-
-def init_database_state_db():
-    logger.info("Initializing database_state.db for database state...")
-    conn = sqlite3.connect('database_state.db')
-    c = conn.cursor()
+import asyncio
+import logging
+import sqlite3
+import random
+from datetime import datetime
+from coc_monitor import CocMonitor
+from fb_bot import FacebookMessenger
+from war_log import init_attack_log_db, get_or_create_war, is_attack_logged, log_attack
+from outbound_queue import OutboundQueue, PRIORITY_STATE, PRIORITY_ATTACK
+from loop_monitor import LoopLagMonitor
+from session_health import SessionWatchdog
+from memory_watchdog import BrowserMemoryWatchdog
+from transports import create_transport
+from commands import registry
+from metrics import metrics, serve_metrics, LOOP_LAG, OUTBOUND_DEPTH, OUTBOUND_OLDEST, BROWSER_MEMORY
+from tracing import tracer, span
+from config import CHECK_INTERVAL, CLAN_TAG, FB_GC_ID, OUTBOUND_COALESCE_WINDOW, OUTBOUND_MAX_COALESCE
+from config import LOOP_LAG_WARN_MS, SESSION_CHECK_INTERVAL
+from config import MEMORY_CHECK_INTERVAL, BROWSER_RSS_LIMIT_MB, BROWSER_HEAP_LIMIT_MB, RECYCLE_QUIET_SECONDS
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+from config import TRACING_ENABLED, TRACE_FILE, TRACE_MAX_MB, TRACE_BACKUPS, OTLP_ENDPOINT
+from config import TRANSPORT, TRANSPORT_OUTBOX, TRANSPORT_INBOX, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_CALLBACK_URL, SCRAPE_TIMEOUT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def init_db():
+    logger.info("Initializing database...")
+    conn = sqlite3.connect('war_status.db')
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS war_state (
+            id INTEGER PRIMARY KEY,
+            state TEXT
+        )
+    ''')
+
+    # Ensure there is one row
+    c.execute('SELECT COUNT(*) FROM war_state')
+    count = c.fetchone()[0]
+    logger.info(f"Rows in war_state table: {count}")
+    if count == 0:
+        logger.info("Inserting default empty state...")
+        c.execute('INSERT INTO war_state (state) VALUES (?)', ('',))
+    conn.commit()
+    conn.close()
+    logger.info("Database initialized.\n")
+
+def init_database_state_db():
+    logger.info("Initializing database_state.db for database state...")
+    conn = sqlite3.connect('database_state.db')
+    c = conn.cursor()
 
     c.execute('''
         CREATE TABLE IF NOT EXISTS state (
@@ -107,27 +99,6 @@ def set_raidweekend_state(state: int):
     conn.commit()
     conn.close()
 
-def is_attack_logged(attacker_tag, defender_name, attack_order):
-    conn = sqlite3.connect('war_attacks.db')
-    c = conn.cursor()
-    c.execute('''
-        SELECT 1 FROM logged_attacks
-        WHERE attacker_tag = ? AND defender_name = ? AND attack_order = ?
-    ''', (attacker_tag, defender_name, attack_order))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def log_attack(attacker_tag, attacker_name, defender_name, destruction, attack_order, opponent_clan):
-    conn = sqlite3.connect('war_attacks.db')
-    c = conn.cursor()
-    c.execute('''
-        INSERT OR IGNORE INTO logged_attacks (attacker_tag,attacker_name,defender_name,destruction_percentage,attack_order,opponent_clan)
-        VALUES (?,?,?,?,?,?)
-    ''', (attacker_tag,attacker_name,defender_name,destruction,attack_order,opponent_clan))
-    conn.commit()
-    conn.close()
-
 def get_last_state():
     logger.info("Fetching last known war state from DB...")
     conn = sqlite3.connect('war_status.db')
@@ -148,7 +119,7 @@ def update_state(new_state):
     conn.close()
     logger.info("War state updated.\n")
 
-async def recent_attack(coc_monitor, fb_bot):
+async def recent_attack(coc_monitor, outbound):
     """Fetch and send recent attacks from clan war, avoiding duplicates."""
 
     zero_destruction_msgs = [
@@ -186,23 +157,32 @@ async def recent_attack(coc_monitor, fb_bot):
         "A triple! You’re unstoppable!"
     ]
 
-    while True:
-        recent_attacks = await coc_monitor.get_recent_attacks(count=3)
-        war_data = await coc_monitor.get_clan_war_state()
-        opponent = ""
+    war_ids = {}  # (opponent, start_time) -> war_id, so the war row is only touched once per war
+
+    async def check_attacks():
+        with span('fetch_attacks'):
+            recent_attacks = await coc_monitor.get_recent_attacks(count=3)
+            war_data = await coc_monitor.get_clan_war_state()
 
-        if war_data:
-            opponent = war_data['opponent']
+        if not recent_attacks or not war_data:
+            return
+
+        # Attacks are keyed by (war_id, order); the war is identified by opponent + start time
+        with span('diff', attacks=len(recent_attacks)):
+            war_key = (war_data['opponent'], war_data['start_time'])
+            war_id = war_ids.get(war_key)
+            if war_id is None:
+                war_id = war_ids[war_key] = await asyncio.to_thread(get_or_create_war, *war_key, war_data['team_size'])
+            new_attacks = await asyncio.to_thread(
+                lambda: [attack for attack in recent_attacks if not is_attack_logged(war_id, attack['order'])]
+            )
 
-        for attack in recent_attacks:
+        for attack in new_attacks:
             attacker_tag = attack['attacker_tag']
             attacker_name = attack['attacker']
             defender_name = attack['defender_name']
             attack_order = attack['order']
 
-            if is_attack_logged(attacker_tag, defender_name, attack_order):
-                continue
-
             destruction = attack['destruction'] or 0
 
             if destruction == 0:
@@ -222,21 +202,112 @@ async def recent_attack(coc_monitor, fb_bot):
             )
 
             print(message)
-            await asyncio.to_thread(fb_bot.send_message, message)
-            log_attack(attacker_tag, attacker_name, defender_name, destruction, attack_order, opponent)
+            with span('enqueue', order=attack_order):
+                outbound.enqueue(message, PRIORITY_ATTACK)
+            with span('log', order=attack_order):
+                try:
+                    await asyncio.to_thread(
+                        log_attack, war_id, attack_order, attacker_tag, attacker_name, defender_name, attack['stars'], destruction
+                    )
+                except sqlite3.IntegrityError:
+                    # The remembered war row is gone (e.g. purged in manage_war); look the war up again
+                    logger.warning(f"⚠️ War {war_id} no longer exists, re-resolving {war_key[0]}")
+                    war_ids.pop(war_key, None)
+                    war_id = war_ids[war_key] = await asyncio.to_thread(get_or_create_war, *war_key, war_data['team_size'])
+                    await asyncio.to_thread(
+                        log_attack, war_id, attack_order, attacker_tag, attacker_name, defender_name, attack['stars'], destruction
+                    )
+
+    while True:
+        metrics.poll('recent_attack', 10)
+        try:
+            with span('attack_poll'):
+                await check_attacks()
+        except Exception as e:
+            logger.error(f"⚠️ Error in attack monitor: {str(e)}")
 
         await asyncio.sleep(10)
 
+def build_transport(fb_bot):
+    """Pick where posts go and commands come from, based on TRANSPORT"""
+    if TRANSPORT == 'facebook':
+        return create_transport('facebook', fb_bot, FB_GC_ID, scrape_timeout=SCRAPE_TIMEOUT)
+    if TRANSPORT == 'jsonl':
+        return create_transport('jsonl', outbox_path=TRANSPORT_OUTBOX, inbox_path=TRANSPORT_INBOX)
+    if TRANSPORT == 'webhook':
+        return create_transport('webhook', host=WEBHOOK_HOST, port=WEBHOOK_PORT, callback_url=WEBHOOK_CALLBACK_URL)
+    return create_transport(TRANSPORT)
+
 async def main():
+    tracer.configure(
+        TRACING_ENABLED,
+        path=TRACE_FILE,
+        max_bytes=TRACE_MAX_MB * 1024 * 1024,
+        backups=TRACE_BACKUPS,
+        otlp_endpoint=OTLP_ENDPOINT
+    )
     coc_monitor = CocMonitor()
-    fb_bot = FacebookMessenger()
-    
-    # Initialize Facebook bot
-    if not fb_bot.login():
-        logger.error("Failed to initialize Facebook bot")
+    fb_bot = FacebookMessenger()  # Commands and kudos; only opens Chrome for the facebook transport
+    fb_bot.war_monitor = coc_monitor
+    transport = build_transport(fb_bot)
+    uses_browser = TRANSPORT == 'facebook'
+
+    # Initialize the transport (for Facebook: log in on the browser thread that will own the driver)
+    if not await transport.start():
+        logger.error(f"Failed to initialize {transport.name} transport")
+        fb_bot.close()
         return
 
-    logger.info("✅ Bot is now listening for commands. Type `!help` to see options.")
+    logger.info(f"✅ Bot is now listening for commands on {transport.name}. Type `!help` to see options.")
+
+    # All posts go through one prioritized queue
+    outbound = OutboundQueue(
+        transport.send,
+        coalesce_window=OUTBOUND_COALESCE_WINDOW,
+        max_coalesce=OUTBOUND_MAX_COALESCE
+    )
+
+    loop_monitor = LoopLagMonitor(warn_threshold=LOOP_LAG_WARN_MS / 1000)
+
+    tasks = [
+        loop_monitor.run(),
+        outbound.run(),
+        coc_monitor_loop(coc_monitor, outbound),
+        fb_bot.listen_for_commands(transport, outbound),
+        recent_attack(coc_monitor, outbound)
+    ]
+
+    if uses_browser:
+        # Re-login happens here, in the background, instead of before each send
+        session_watchdog = SessionWatchdog(fb_bot, interval=SESSION_CHECK_INTERVAL)
+
+        # Restarts Chrome in a quiet moment once it has bloated
+        memory_watchdog = BrowserMemoryWatchdog(
+            fb_bot,
+            outbound,
+            interval=MEMORY_CHECK_INTERVAL,
+            rss_limit_mb=BROWSER_RSS_LIMIT_MB,
+            heap_limit_mb=BROWSER_HEAP_LIMIT_MB,
+            quiet_seconds=RECYCLE_QUIET_SECONDS
+        )
+        tasks += [session_watchdog.run(), memory_watchdog.run()]
+
+    if METRICS_ENABLED:
+        def collect():
+            """Copy state kept elsewhere into the gauges at scrape time"""
+            lag = loop_monitor.stats()
+            for stat in ('current', 'p50', 'p99', 'max'):
+                LOOP_LAG.set(round(lag[stat], 4), stat=stat)
+            for lane, depth in outbound.depth().items():
+                OUTBOUND_DEPTH.set(depth, lane=lane)
+            OUTBOUND_OLDEST.set(round(outbound.oldest_age(), 3))
+            if uses_browser:
+                sample = memory_watchdog.last_sample
+                BROWSER_MEMORY.set(sample.get('rss'), kind='rss')
+                BROWSER_MEMORY.set(sample.get('js_heap'), kind='js_heap')
+
+        metrics.add_collector(collect)
+        tasks.append(serve_metrics(METRICS_HOST, METRICS_PORT))
 
     # Create tasks for both operations
     init_db()
@@ -244,20 +315,20 @@ async def main():
     init_database_state_db()
 
     try:
-        # Run both tasks concurrently
-        await asyncio.gather(
-            coc_monitor_loop(coc_monitor, fb_bot),
-            fb_bot.listen_for_commands(FB_GC_ID),
-            recent_attack(coc_monitor, fb_bot)
-        )
+        # Run all tasks concurrently
+        await asyncio.gather(*tasks)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        fb_bot.close()
+        await transport.close()
+        if not uses_browser:
+            fb_bot.close()  # Stops the idle browser thread
+        tracer.shutdown()
 
-async def coc_monitor_loop(coc_monitor, fb_bot):
+async def coc_monitor_loop(coc_monitor, outbound):
     """Handle the CoC war monitoring in a separate async loop"""
     while True:
+        metrics.poll('coc_monitor', CHECK_INTERVAL)
         try:
             war_data = await coc_monitor.get_clan_war_state()
             
@@ -269,11 +340,11 @@ async def coc_monitor_loop(coc_monitor, fb_bot):
             
             if war_data:
                 new_state = war_data['state']
-                last_state = get_last_state()
+                last_state = await asyncio.to_thread(get_last_state)
                 
                 if new_state != last_state:
                     logger.info(f"War state changed: {last_state} → {new_state}")
-                    update_state(new_state)
+                    await asyncio.to_thread(update_state, new_state)
                     coc_monitor.current_state = new_state
 
                     opponent = war_data['opponent']
@@ -386,27 +457,27 @@ async def coc_monitor_loop(coc_monitor, fb_bot):
                     else:
                         message = f"War state changed to {new_state}"
                     
-                    await asyncio.to_thread(fb_bot.send_message, message)
-                    logger.info("Message sent to Facebook:\n" + message)
+                    outbound.enqueue(message, PRIORITY_STATE)
+                    logger.info("Message queued for Facebook:\n" + message)
 
                 if war_data.get("maintenance"):
-                    if get_maintenance_state() == 0:
+                    if await asyncio.to_thread(get_maintenance_state) == 0:
                         message = (
                             "A maintenance break is currently in progress.\n"
                             "Please be advised that game services may be temporarily unavailable."
                         )
                         print(message)
-                        await asyncio.to_thread(fb_bot.send_message, message)
-                        set_maintenance_state(1)
+                        outbound.enqueue(message, PRIORITY_STATE)
+                        await asyncio.to_thread(set_maintenance_state, 1)
                 else:
-                    if get_maintenance_state() == 1:
+                    if await asyncio.to_thread(get_maintenance_state) == 1:
                         message = (
                             "The Clash of Clans maintenance break has ended.\n"
                             "You can now return to battle and manage your village!"
                         )
                         logger.info(message)
-                        await asyncio.to_thread(fb_bot.send_message, message)
-                        set_maintenance_state(0)
+                        outbound.enqueue(message, PRIORITY_STATE)
+                        await asyncio.to_thread(set_maintenance_state, 0)
 
             if raid_data:
                 start_time = coc_monitor.get_local_time_str(raid_data['startTime'])
@@ -415,7 +486,7 @@ async def coc_monitor_loop(coc_monitor, fb_bot):
                 total_attacks = raid_data.get('attacks', 0)
                 total_loot = raid_data.get('loot', 0)
 
-                raid_weekend_state = get_raidweekend_state()
+                raid_weekend_state = await asyncio.to_thread(get_raidweekend_state)
 
                 # Detect start of Raid Weekend
                 if state == "inProgress" and raid_weekend_state == 0:
@@ -426,9 +497,9 @@ async def coc_monitor_loop(coc_monitor, fb_bot):
                         f"Clanmates, please coordinate and use all your attacks wisely.\n"
                         f"Let's aim for maximum progress and upgrades for our Capital!"
                     )
-                    await asyncio.to_thread(fb_bot.send_message, message)
-                    logger.info("Raid Weekend START message sent.")
-                    set_raidweekend_state(1)
+                    outbound.enqueue(message, PRIORITY_STATE)
+                    logger.info("Raid Weekend START message queued.")
+                    await asyncio.to_thread(set_raidweekend_state, 1)
 
                 # Detect end of Raid Weekend
                 elif state == "ended" and raid_weekend_state == 1:
@@ -438,9 +509,9 @@ async def coc_monitor_loop(coc_monitor, fb_bot):
                         f"Now it's time to put that Capital Gold to good use and upgrade our defenses.\n"
                         f"Great work, team!"
                     )
-                    await asyncio.to_thread(fb_bot.send_message, message)
-                    logger.info("Raid Weekend END message sent.")
-                    set_raidweekend_state(0)
+                    outbound.enqueue(message, PRIORITY_STATE)
+                    logger.info("Raid Weekend END message queued.")
+                    await asyncio.to_thread(set_raidweekend_state, 0)
             
             await asyncio.sleep(CHECK_INTERVAL)
             print(f"♻️ Refreshed at {datetime.today().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -2,8 +2,9 @@ import sqlite3
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import messagebox, Listbox, END
+from war_log import connect, init_attack_log_db, get_or_create_war, get_attack_table
 
-DB_NAME = 'war_attacks.db'
+TABLE_NAME = 'attacks'
 
 def on_row_select(event):
     selected = tree.focus()
@@ -11,19 +12,24 @@ def on_row_select(event):
         return
     values = tree.item(selected, 'values')
     if values: 
-        attacker_tag_var.set(values[0])
-        defender_name_var.set(values[1])
-        attack_order_var.set(values[2])
-        new_attack_order_var.set(values[2])
-        attacker_name_var.set(values[3])
-        destruction_percentage_var.set(values[4])
-        opponent_clan_var.set(values[5]) # Last column in database: last index
+        row = dict(zip(tree['columns'], values))
+        war_id_var.set(row.get('war_id', ''))
+        attacker_tag_var.set(row.get('attacker_tag', ''))
+        defender_name_var.set(row.get('defender_name', ''))
+        attack_order_var.set(row.get('attack_order', ''))
+        new_attack_order_var.set(row.get('attack_order', ''))
+        attacker_name_var.set(row.get('attacker_name', ''))
+        stars_var.set(row.get('stars', ''))
+        destruction_percentage_var.set(str(row.get('destruction_percentage', '')).rstrip('%'))
+        opponent_clan_var.set(row.get('opponent_clan', ''))
 
 def clear_fields():
+    war_id_var.set("")
     attacker_tag_var.set("")
     attacker_name_var.set("")
     defender_name_var.set("")
     destruction_percentage_var.set("")
+    stars_var.set("")
     opponent_clan_var.set("")
     attack_order_var.set("")
     new_attack_order_var.set("")
@@ -31,12 +37,7 @@ def clear_fields():
 def refresh_tree(filter_text=""):
     for row in tree.get_children():
         tree.delete(row)
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Get current columns in the table
-    c.execute("PRAGMA table_info(logged_attacks)")
-    columns = [col[1] for col in c.fetchall()]
+    columns, rows = get_attack_table(filter_text)
     
     # Reconfigure treeview columns
     tree['columns'] = columns
@@ -44,55 +45,49 @@ def refresh_tree(filter_text=""):
         tree.heading(col, text=col)
         tree.column(col, width=100)
     
-    # Build query based on available columns
-    if filter_text:
-        query = f'''
-            SELECT {', '.join(columns)}
-            FROM logged_attacks
-            WHERE attacker_tag LIKE ? OR attacker_name LIKE ? OR defender_name LIKE ?
-        '''
-        params = (f'%{filter_text}%', f'%{filter_text}%', f'%{filter_text}%')
-    else:
-        query = f'''
-            SELECT {', '.join(columns)}
-            FROM logged_attacks
-        '''
-        params = ()
-    
-    c.execute(query, params)
-    for row in c.fetchall():
+    for row in rows:
         formatted_row = list(row)
         # Format destruction percentage if the column exists
         if 'destruction_percentage' in columns:
             index = columns.index('destruction_percentage')
-            formatted_row[index] = f"{formatted_row[index]}%" if not str(formatted_row[index]).endswith('%') else formatted_row[index]
+            value = formatted_row[index]
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            formatted_row[index] = f"{value}%"
         tree.insert('', 'end', values=formatted_row)
 
-    conn.close()
+def read_numbers():
+    """Parse the numeric form fields, returning None if any is invalid."""
+    try:
+        stars = int(stars_var.get()) if stars_var.get() else None
+        destruction = float(destruction_percentage_var.get().rstrip('%'))
+        attack_order = int(attack_order_var.get())
+    except ValueError:
+        messagebox.showerror("Error", "Attack Order and Stars must be integers and Destruction % a number.")
+        return None
+    return stars, destruction, attack_order
 
 def create_attack():
     if not attacker_tag_var.get() or not attacker_name_var.get() or not defender_name_var.get() or not destruction_percentage_var.get() or not opponent_clan_var.get() or not attack_order_var.get():
         messagebox.showerror("Error", "All fields are required.")
         return
 
-    try:
-        data = (
-            attacker_tag_var.get(),
-            attacker_name_var.get(),
-            defender_name_var.get(),
-            destruction_percentage_var.get(),
-            opponent_clan_var.get(),
-            int(attack_order_var.get()) 
-        )
-    except ValueError:
-        messagebox.showerror("Error", "Attack Order must be an integer.")
+    numbers = read_numbers()
+    if numbers is None:
         return
+    stars, destruction, attack_order = numbers
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     c = conn.cursor()
 
     try:
-        c.execute('INSERT INTO logged_attacks VALUES (?, ?, ?, ?, ?, ?)', data)
+        # Use the selected war if there is one, otherwise file it under the opponent
+        war_id = war_id_var.get() or get_or_create_war(opponent_clan_var.get(), conn=conn)
+        c.execute(f'''INSERT INTO {TABLE_NAME}
+                    (war_id, attack_order, attacker_tag, attacker_name, defender_name, stars, destruction_percentage)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                  (int(war_id), attack_order, attacker_tag_var.get(), attacker_name_var.get(),
+                   defender_name_var.get(), stars, destruction))
         conn.commit()
         # messagebox.showinfo("Success", "Attack added.")
         refresh_tree()
@@ -102,33 +97,49 @@ def create_attack():
     conn.close()
 
 def update_attack():
+    if not war_id_var.get():
+        messagebox.showerror("Error", "Select an attack to update.")
+        return
+
+    numbers = read_numbers()
+    if numbers is None:
+        return
+    stars, destruction, attack_order = numbers
+
     try:
-        attacker_tag = attacker_tag_var.get()
-        attacker_name = attacker_name_var.get()
-        defender_name = defender_name_var.get()
-        destruction_percentage = destruction_percentage_var.get()
-        opponent_clan = opponent_clan_var.get()
-        attack_order = int(attack_order_var.get())
+        war_id = int(war_id_var.get())
+        new_attack_order = int(new_attack_order_var.get() or attack_order)
     except ValueError:
         messagebox.showerror("Error", "All fields must be filled correctly with integers for Attack Orders.")
         return
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     c = conn.cursor()
     
     try:
-        c.execute('''UPDATE logged_attacks
-                    SET attacker_tag=?,attacker_name=?,defender_name=?,destruction_percentage=?, opponent_clan=? WHERE attack_order=?''',
-                  (attacker_tag, attacker_name, defender_name, destruction_percentage, opponent_clan, attack_order))
+        # (war_id, attack_order) is the key, so this touches exactly one row
+        c.execute(f'''UPDATE {TABLE_NAME}
+                    SET attacker_tag=?, attacker_name=?, defender_name=?, stars=?, destruction_percentage=?, attack_order=?
+                    WHERE war_id=? AND attack_order=?''',
+                  (attacker_tag_var.get(), attacker_name_var.get(), defender_name_var.get(), stars, destruction,
+                   new_attack_order, war_id, attack_order))
+        updated = c.rowcount
+
+        # The opponent belongs to the war, not the attack
+        if updated > 0 and opponent_clan_var.get():
+            c.execute('UPDATE wars SET opponent_clan=? WHERE war_id=?', (opponent_clan_var.get(), war_id))
         conn.commit()
         
-        if c.rowcount > 0:
+        if updated > 0:
             # messagebox.showinfo("Updated", "Attack updated successfully.")
             refresh_tree()
             clear_fields()
         else:
             messagebox.showwarning("No Changes", "No record was updated. Please check if the data exists.")
     
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        messagebox.showwarning("Duplicate", "Another attack in this war already uses that order.")
     except sqlite3.Error as e:
         messagebox.showerror("Database Error", f"An error occurred: {e}")
     
@@ -143,20 +154,18 @@ def delete_attack():
     
     values = tree.item(selected, 'values')
     if values:
-        attacker_tag = values[0]
-        defender_name = values[1]
-        attack_order_str = values[2]
-
-        messagebox.askyesno("DEBUG", f"Tag: {attacker_tag} Defender: {defender_name} Order: {attack_order_str}")
+        row = dict(zip(tree['columns'], values))
+        war_id = row['war_id']
+        attack_order = row['attack_order']
         
-        confirm = messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete this attack:\n{attacker_tag} vs {defender_name}?")
+        confirm = messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete this attack:\n{row.get('attacker_tag')} vs {row.get('defender_name')}?")
         if not confirm:
             return
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect()
         c = conn.cursor()
-        c.execute('''DELETE FROM logged_attacks WHERE attacker_tag = ? AND defender_name = ? AND attack_order = ?''',
-                  (attacker_tag, defender_name, attack_order_str))
+        c.execute(f'''DELETE FROM {TABLE_NAME} WHERE war_id = ? AND attack_order = ?''',
+                  (int(war_id), int(attack_order)))
         conn.commit()
         conn.close()
 
@@ -169,9 +178,10 @@ def purge_attack():
     if not confirm:
         return
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     c = conn.cursor()
-    c.execute('DELETE FROM logged_attacks')
+    c.execute(f'DELETE FROM {TABLE_NAME}')
+    c.execute('DELETE FROM wars')
     conn.commit()
     conn.close()
     # messagebox.showinfo("Purged", "All data has been deleted.")
@@ -188,9 +198,9 @@ def manage_columns():
         columns_listbox.delete(0, END)
         
         # Get current columns from database
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect()
         c = conn.cursor()
-        c.execute("PRAGMA table_info(logged_attacks)")
+        c.execute(f"PRAGMA table_info({TABLE_NAME})")
         columns = c.fetchall()
         conn.close()
         
@@ -207,19 +217,19 @@ def manage_columns():
             messagebox.showerror("Error", "Column name cannot be empty")
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect()
         c = conn.cursor()
         
         try:
             # Check if column already exists
-            c.execute("PRAGMA table_info(logged_attacks)")
+            c.execute(f"PRAGMA table_info({TABLE_NAME})")
             existing_columns = [col[1] for col in c.fetchall()]
             if column_name in existing_columns:
                 messagebox.showerror("Error", f"Column '{column_name}' already exists")
                 return
                 
             # Add the new column
-            c.execute(f"ALTER TABLE logged_attacks ADD COLUMN {column_name} {column_type}")
+            c.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column_name} {column_type}")
             conn.commit()
             messagebox.showinfo("Success", f"Column '{column_name}' added successfully")
             refresh_columns_list()
@@ -250,7 +260,7 @@ def manage_columns():
             messagebox.showwarning("No Changes", "Column specifications are identical")
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect()
         c = conn.cursor()
         
         try:
@@ -262,27 +272,27 @@ def manage_columns():
                 if old_name == new_name:
                     # Add temporary column
                     temp_name = f"{old_name}_temp"
-                    c.execute(f"ALTER TABLE logged_attacks ADD COLUMN {temp_name} {new_type}")
+                    c.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {temp_name} {new_type}")
                     # Copy data
-                    c.execute(f"UPDATE logged_attacks SET {temp_name} = {old_name}")
+                    c.execute(f"UPDATE {TABLE_NAME} SET {temp_name} = {old_name}")
                     # Drop old column
-                    c.execute(f"ALTER TABLE logged_attacks DROP COLUMN {old_name}")
+                    c.execute(f"ALTER TABLE {TABLE_NAME} DROP COLUMN {old_name}")
                     # Rename temp column
-                    c.execute(f"ALTER TABLE logged_attacks RENAME COLUMN {temp_name} TO {new_name}")
+                    c.execute(f"ALTER TABLE {TABLE_NAME} RENAME COLUMN {temp_name} TO {new_name}")
                 
                 # Case 2: Changing name (and optionally type)
                 else:
                     # Add new column
-                    c.execute(f"ALTER TABLE logged_attacks ADD COLUMN {new_name} {new_type}")
+                    c.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {new_name} {new_type}")
                     # Copy data
-                    c.execute(f"UPDATE logged_attacks SET {new_name} = {old_name}")
+                    c.execute(f"UPDATE {TABLE_NAME} SET {new_name} = {old_name}")
                     # Drop old column
-                    c.execute(f"ALTER TABLE logged_attacks DROP COLUMN {old_name}")
+                    c.execute(f"ALTER TABLE {TABLE_NAME} DROP COLUMN {old_name}")
             
             # Fallback for older SQLite versions
             else:
                 # Get all columns
-                c.execute("PRAGMA table_info(logged_attacks)")
+                c.execute(f"PRAGMA table_info({TABLE_NAME})")
                 columns = c.fetchall()
                 
                 # Build new table structure
@@ -295,7 +305,7 @@ def manage_columns():
                 
                 # Create new table
                 c.execute(f"""
-                    CREATE TABLE new_logged_attacks (
+                    CREATE TABLE new_{TABLE_NAME} (
                         {', '.join(new_columns)}
                     )
                 """)
@@ -304,13 +314,13 @@ def manage_columns():
                 old_cols = [col[1] for col in columns]
                 new_cols = [new_name if col == old_name else col for col in old_cols]
                 c.execute(f"""
-                    INSERT INTO new_logged_attacks ({', '.join(new_cols)})
-                    SELECT {', '.join(old_cols)} FROM logged_attacks
+                    INSERT INTO new_{TABLE_NAME} ({', '.join(new_cols)})
+                    SELECT {', '.join(old_cols)} FROM {TABLE_NAME}
                 """)
                 
                 # Drop old table and rename new one
-                c.execute("DROP TABLE logged_attacks")
-                c.execute("ALTER TABLE new_logged_attacks RENAME TO logged_attacks")
+                c.execute(f"DROP TABLE {TABLE_NAME}")
+                c.execute(f"ALTER TABLE new_{TABLE_NAME} RENAME TO {TABLE_NAME}")
             
             conn.commit()
             messagebox.showinfo("Success", f"Column '{old_name}' modified to '{new_name}' ({new_type})")
@@ -334,7 +344,7 @@ def manage_columns():
         if not messagebox.askyesno("Confirm", f"Are you sure you want to drop column '{column_name}'?"):
             return
             
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect()
         c = conn.cursor()
         
         try:
@@ -342,12 +352,12 @@ def manage_columns():
             
             # Modern SQLite approach (version 3.35.0+)
             if sqlite3.sqlite_version_info >= (3, 35, 0):
-                c.execute(f"ALTER TABLE logged_attacks DROP COLUMN {column_name}")
+                c.execute(f"ALTER TABLE {TABLE_NAME} DROP COLUMN {column_name}")
             
             # Fallback for older SQLite versions
             else:
                 # Get all columns except the one to drop
-                c.execute("PRAGMA table_info(logged_attacks)")
+                c.execute(f"PRAGMA table_info({TABLE_NAME})")
                 columns = [col for col in c.fetchall() if col[1] != column_name]
                 
                 # Build new table structure
@@ -355,7 +365,7 @@ def manage_columns():
                 
                 # Create new table
                 c.execute(f"""
-                    CREATE TABLE new_logged_attacks (
+                    CREATE TABLE new_{TABLE_NAME} (
                         {', '.join(new_columns)}
                     )
                 """)
@@ -363,13 +373,13 @@ def manage_columns():
                 # Copy data (except dropped column)
                 col_names = [col[1] for col in columns]
                 c.execute(f"""
-                    INSERT INTO new_logged_attacks ({', '.join(col_names)})
-                    SELECT {', '.join(col_names)} FROM logged_attacks
+                    INSERT INTO new_{TABLE_NAME} ({', '.join(col_names)})
+                    SELECT {', '.join(col_names)} FROM {TABLE_NAME}
                 """)
                 
                 # Drop old table and rename new one
-                c.execute("DROP TABLE logged_attacks")
-                c.execute("ALTER TABLE new_logged_attacks RENAME TO logged_attacks")
+                c.execute(f"DROP TABLE {TABLE_NAME}")
+                c.execute(f"ALTER TABLE new_{TABLE_NAME} RENAME TO {TABLE_NAME}")
             
             conn.commit()
             messagebox.showinfo("Success", f"Column '{column_name}' dropped successfully")
@@ -463,10 +473,12 @@ app.geometry("1100x550")
 frame = ttk.Frame(app, padding=10)
 frame.pack(fill=X)
 
+war_id_var = ttk.StringVar()
 attacker_tag_var = ttk.StringVar()
 attacker_name_var = ttk.StringVar()
 defender_name_var = ttk.StringVar()
 destruction_percentage_var = ttk.StringVar()
+stars_var = ttk.StringVar()
 opponent_clan_var = ttk.StringVar()
 attack_order_var = ttk.StringVar()
 new_attack_order_var = ttk.StringVar()
@@ -478,6 +490,9 @@ ttk.Entry(frame, textvariable=attacker_tag_var, width=20).grid(row=0, column=1,
 ttk.Label(frame, text="Attacker Name").grid(row=0, column=2, padx=5, pady=5, sticky="w")
 ttk.Entry(frame, textvariable=attacker_name_var, width=20).grid(row=0, column=3, padx=5, pady=5)
 
+ttk.Label(frame, text="War ID").grid(row=0, column=4, padx=5, pady=5, sticky="w")
+ttk.Entry(frame, textvariable=war_id_var, width=10).grid(row=0, column=5, padx=5, pady=5)
+
 # Row 1
 ttk.Label(frame, text="Defender Name").grid(row=1, column=0, padx=5, pady=5, sticky="w")
 ttk.Entry(frame, textvariable=defender_name_var, width=20).grid(row=1, column=1, padx=5, pady=5)
@@ -485,6 +500,9 @@ ttk.Entry(frame, textvariable=defender_name_var, width=20).grid(row=1, column=1,
 ttk.Label(frame, text="Destruction %").grid(row=1, column=2, padx=5, pady=5, sticky="w")
 ttk.Entry(frame, textvariable=destruction_percentage_var, width=10).grid(row=1, column=3, padx=5, pady=5)
 
+ttk.Label(frame, text="Stars").grid(row=1, column=4, padx=5, pady=5, sticky="w")
+ttk.Entry(frame, textvariable=stars_var, width=10).grid(row=1, column=5, padx=5, pady=5)
+
 # Row 2
 ttk.Label(frame, text="Opponent Clan").grid(row=2, column=0, padx=5, pady=5, sticky="w")
 ttk.Entry(frame, textvariable=opponent_clan_var, width=20).grid(row=2, column=1, padx=5, pady=5)
@@ -512,21 +530,16 @@ ttk.Entry(app, textvariable=search_var, width=30).pack(anchor="w", padx=10)
 search_var.trace_add("write", search_attacks)
 
 tree = ttk.Treeview(app, 
-                   columns=('attacker_tag', 'attacker_name', 'defender_name', 
-                           'destruction_percentage', 'opponent_clan', 'attack_order'), 
+                   columns=('war_id', 'opponent_clan', 'attack_order', 'attacker_tag', 'attacker_name',
+                           'defender_name', 'stars', 'destruction_percentage'), 
                    show='headings', 
                    bootstyle="primary")
 
-tree.heading('attacker_tag', text='Attacker Tag')
-tree.heading('attacker_name', text='Attacker Name')
-tree.heading('defender_name', text='Defender Name')
-tree.heading('destruction_percentage', text='Destruction %')
-tree.heading('opponent_clan', text='Opponent Clan') 
-tree.heading('attack_order', text='Attack Order')
 tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
 
 tree.bind("<<TreeviewSelect>>", on_row_select)
 
-# Initialize with current columns
+# Initialize with current columns (migrates the legacy table on first run)
+init_attack_log_db()
 refresh_tree()
 app.mainloop()
\ No newline at end of file
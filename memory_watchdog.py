@@ -0,0 +1,162 @@
+# memory_watchdog.py
+import asyncio
+import time
+import logging
+
+try:
+    import psutil
+except ImportError:  # Optional: without it only the JS heap is watched
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1048576
+
+
+def process_tree_rss(pid):
+    """Resident memory of a process and all its descendants, in bytes"""
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue  # Renderer exited between listing and sampling
+    return total
+
+
+class BrowserMemoryWatchdog:
+    """
+    Samples Chrome's memory and recycles the browser when it has bloated.
+
+    Two numbers are tracked: the resident memory of the whole Chrome process
+    tree (needs psutil) and the chat page's JS heap. Once either crosses its
+    limit, the watchdog waits for a quiet period (outbound queue empty for
+    quiet_seconds), then quits Chrome and relaunches it on the same profile
+    so the session and chat are restored. Over hard_factor times the limit
+    it stops waiting for quiet after max_defer seconds.
+    """
+
+    def __init__(self, messenger, outbound=None, interval=300, rss_limit_mb=1500, heap_limit_mb=400,
+                 quiet_seconds=30, max_defer=1800, hard_factor=1.5):
+        """
+        Args:
+            messenger: FacebookMessenger owning the browser
+            outbound: OutboundQueue that must be drained before recycling
+            interval: seconds between samples
+            rss_limit_mb: Chrome process-tree RSS that triggers a recycle
+            heap_limit_mb: JS heap size that triggers a recycle
+            quiet_seconds: how long the outbound queue must stay empty first
+            max_defer: longest wait for a quiet period when far over the limit
+            hard_factor: multiple of a limit that counts as far over it
+        """
+        self.messenger = messenger
+        self.outbound = outbound
+        self.interval = interval
+        self.rss_limit = rss_limit_mb * MB
+        self.heap_limit = heap_limit_mb * MB
+        self.quiet_seconds = quiet_seconds
+        self.max_defer = max_defer
+        self.hard_factor = hard_factor
+        self.last_sample = {}
+        self.peak_rss = 0
+        self.recycles = 0
+        self.last_recycle = None
+
+        if psutil is None:
+            logger.warning("⚠️ psutil not installed; browser memory watchdog will only track the JS heap")
+
+    def stats(self):
+        return {
+            'rss_mb': round((self.last_sample.get('rss') or 0) / MB, 1),
+            'js_heap_mb': round((self.last_sample.get('js_heap') or 0) / MB, 1),
+            'peak_rss_mb': round(self.peak_rss / MB, 1),
+            'recycles': self.recycles,
+            'last_recycle': self.last_recycle,
+        }
+
+    def browser_pid(self):
+        driver = self.messenger.driver
+        if driver is None:
+            return None
+        # undetected_chromedriver starts Chrome itself; plain Selenium parents it under chromedriver
+        pid = getattr(driver, 'browser_pid', None)
+        if pid is None and getattr(driver, 'service', None) is not None and driver.service.process:
+            pid = driver.service.process.pid
+        return pid
+
+    def sample(self):
+        """Read RSS and JS heap. Runs on the browser thread."""
+        rss = None
+        pid = self.browser_pid()
+        if psutil is not None and pid:
+            rss = process_tree_rss(pid)
+
+        js_heap = self.messenger.page_metrics().get('js_heap_bytes') if self.messenger.driver else None
+        return {'rss': rss, 'js_heap': js_heap}
+
+    def over_limit(self, sample, factor=1.0):
+        rss, js_heap = sample.get('rss'), sample.get('js_heap')
+        return bool(
+            (rss and rss > self.rss_limit * factor) or
+            (js_heap and js_heap > self.heap_limit * factor)
+        )
+
+    async def wait_for_quiet(self, deadline):
+        """Wait until nothing has been queued for quiet_seconds, or until deadline"""
+        quiet_since = None
+        while deadline is None or time.monotonic() < deadline:
+            if self.outbound is None or self.outbound.is_idle():
+                quiet_since = quiet_since or time.monotonic()
+                if time.monotonic() - quiet_since >= self.quiet_seconds:
+                    return True
+            else:
+                quiet_since = None
+            await asyncio.sleep(1)
+        return False
+
+    async def recycle(self, sample):
+        hard = self.over_limit(sample, self.hard_factor)
+        deadline = time.monotonic() + self.max_defer if hard else None
+        logger.info("♻️ Browser over memory limit, waiting for a quiet period to recycle it...")
+
+        if not await self.wait_for_quiet(deadline):
+            logger.warning(f"⚠️ No quiet period in {self.max_defer}s, recycling anyway")
+            # Still let whatever is already queued go out on the old browser first
+            while self.outbound is not None and not self.outbound.is_idle():
+                await asyncio.sleep(1)
+
+        started = time.perf_counter()
+        if await self.messenger.browser.run(self.messenger.recycle_browser, timeout=180):
+            self.recycles += 1
+            self.last_recycle = time.time()
+            logger.info(f"✅ Browser recycled in {time.perf_counter() - started:.1f}s")
+        else:
+            logger.error("❌ Browser recycle failed")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                sample = await self.messenger.browser.run(self.sample, timeout=30)
+            except Exception as e:
+                logger.warning(f"⚠️ Browser memory sample failed: {e}")
+                continue
+
+            self.last_sample = sample
+            self.peak_rss = max(self.peak_rss, sample.get('rss') or 0)
+            logger.info(
+                f"🧠 Browser memory: RSS {(sample.get('rss') or 0) / MB:.0f}MB, "
+                f"JS heap {(sample.get('js_heap') or 0) / MB:.0f}MB"
+            )
+
+            if self.over_limit(sample):
+                try:
+                    await self.recycle(sample)
+                except Exception as e:
+                    logger.error(f"❌ Browser recycle failed: {e}")
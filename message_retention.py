@@ -0,0 +1,127 @@
+# message_retention.py
+import os
+import sqlite3
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = 'fb_messages.db'
+
+
+def migrate_message_history(conn):
+    """Bring message_history to the typed-timestamp schema.
+
+    processed_at used to be TEXT holding either utcnow().isoformat() or a local
+    '%Y-%m-%d %H:%M:%S' string. It is now INTEGER unix seconds (UTC) with an
+    index, so retention can range-scan instead of comparing mixed strings.
+    Also switches the file to incremental auto-vacuum (needs a one-off VACUUM).
+    """
+    c = conn.cursor()
+
+    if c.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        logger.info("Enabling incremental auto-vacuum on message database...")
+        c.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.commit()
+        c.execute('VACUUM')
+
+    c.execute('PRAGMA table_info(message_history)')
+    columns = {col[1]: col[2] for col in c.fetchall()}
+    if columns.get('processed_at', '').upper() == 'TEXT':
+        logger.info("Migrating message_history.processed_at to unix timestamps...")
+        try:
+            c.execute('BEGIN')
+            c.execute('''
+                CREATE TABLE message_history_new (
+                    message_id TEXT PRIMARY KEY,
+                    sender TEXT,
+                    message TEXT,
+                    processed_at INTEGER NOT NULL
+                )
+            ''')
+            # ISO strings were written in UTC, the others in local time
+            c.execute('''
+                INSERT INTO message_history_new (message_id, sender, message, processed_at)
+                SELECT message_id, sender, message,
+                    COALESCE(
+                        CASE WHEN processed_at LIKE '____-__-__T%'
+                             THEN CAST(strftime('%s', substr(processed_at, 1, 19)) AS INTEGER)
+                             ELSE CAST(strftime('%s', processed_at, 'utc') AS INTEGER)
+                        END,
+                        CAST(strftime('%s', 'now') AS INTEGER)
+                    )
+                FROM message_history
+            ''')
+            c.execute('DROP TABLE message_history')
+            c.execute('ALTER TABLE message_history_new RENAME TO message_history')
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Failed to migrate message_history: {e}")
+            return
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_message_history_processed_at
+        ON message_history (processed_at)
+    ''')
+    conn.commit()
+
+
+def purge_message_history(max_age_minutes=1440, batch_size=500, pause=0.05, db_name=DB_NAME):
+    """Delete processed messages older than max_age_minutes in small batches.
+
+    Each batch is its own short transaction, with a short pause in between so
+    other writers (kudos, dedup) never wait long on the database lock.
+    Freed pages are then returned to the OS with incremental vacuum.
+
+    Returns:
+        dict with rows_purged, batches, bytes_reclaimed and seconds
+    """
+    started = time.perf_counter()
+    cutoff = int(time.time()) - max_age_minutes * 60
+    rows_purged = 0
+    batches = 0
+
+    conn = sqlite3.connect(db_name, timeout=5)
+    try:
+        c = conn.cursor()
+        while True:
+            c.execute('''
+                DELETE FROM message_history
+                WHERE rowid IN (
+                    SELECT rowid FROM message_history
+                    WHERE processed_at < ?
+                    LIMIT ?
+                )
+            ''', (cutoff, batch_size))
+            deleted = c.rowcount
+            conn.commit()
+            if deleted <= 0:
+                break
+            rows_purged += deleted
+            batches += 1
+            if deleted < batch_size:
+                break
+            time.sleep(pause)
+
+        page_size = c.execute('PRAGMA page_size').fetchone()[0]
+        free_before = c.execute('PRAGMA freelist_count').fetchone()[0]
+        size_before = os.path.getsize(db_name)
+        # executescript steps the pragma to completion; execute() frees a single page
+        conn.executescript('PRAGMA incremental_vacuum;')
+        free_after = c.execute('PRAGMA freelist_count').fetchone()[0]
+        size_after = os.path.getsize(db_name)
+    finally:
+        conn.close()
+
+    report = {
+        'rows_purged': rows_purged,
+        'batches': batches,
+        'bytes_reclaimed': max((free_before - free_after) * page_size, size_before - size_after, 0),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        f"🧹 Message retention: purged {report['rows_purged']} rows in {report['batches']} batches, "
+        f"reclaimed {report['bytes_reclaimed']} bytes in {report['seconds']}s"
+    )
+    return report
@@ -0,0 +1,208 @@
+# metrics.py
+import asyncio
+import bisect
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()  # Observed from the loop and from worker threads
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self.values = {}
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        with self.lock:
+            items = [(key, value) for key, value in self.values.items() if value is not None]
+        return self.header() + [f"{self.name}{format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.series.items()]
+
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{format_labels(key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format.
+
+    Hot paths record into counters, gauges and histograms directly. State
+    that already lives on other objects (queue depth, loop lag, browser
+    memory) is pulled by collector callbacks at scrape time instead.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.last_poll = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help):
+        return self.metrics.get(name) or self.register(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self.metrics.get(name) or self.register(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.metrics.get(name) or self.register(Histogram(name, help, buckets))
+
+    def add_collector(self, collect):
+        """collect() is called before every scrape to refresh pulled gauges"""
+        self.collectors.append(collect)
+
+    def poll(self, loop, interval):
+        """Record how late a polling loop's iteration started compared to its interval"""
+        now = time.monotonic()
+        previous = self.last_poll.get(loop)
+        self.last_poll[loop] = now
+        if previous is not None:
+            POLL_LAG.set(round(max(0.0, now - previous - interval), 4), loop=loop)
+
+    def render(self):
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {e}")
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+API_LATENCY = metrics.histogram("coc_api_request_seconds", "Clash of Clans API request latency by endpoint")
+API_ERRORS = metrics.counter("coc_api_errors_total", "Clash of Clans API non-200 responses and failures by endpoint")
+API_RATE_LIMIT = metrics.gauge("coc_api_ratelimit_remaining", "Requests left in the API rate-limit window, when reported")
+POLL_LAG = metrics.gauge("poll_lag_seconds", "How late the last iteration of each polling loop started")
+LOOP_LAG = metrics.gauge("event_loop_lag_seconds", "Event-loop lag from the loop monitor")
+OUTBOUND_DEPTH = metrics.gauge("outbound_queue_depth", "Messages waiting per outbound lane")
+OUTBOUND_OLDEST = metrics.gauge("outbound_queue_oldest_seconds", "Age of the oldest queued outbound message")
+OUTBOUND_TOTAL = metrics.counter("outbound_messages_total", "Outbound messages by result (sent, failed, coalesced)")
+SEND_LATENCY = metrics.histogram("send_seconds", "Time for one post to go out through the transport")
+BROWSER_SEND_STAGE = metrics.histogram("browser_send_stage_seconds", "Browser send latency by stage")
+SCRAPE_LATENCY = metrics.histogram("receive_seconds", "Time for one command poll (chat scrape) by transport")
+DB_WRITE_LATENCY = metrics.histogram("db_write_seconds", "SQLite write latency by operation")
+BROWSER_MEMORY = metrics.gauge("browser_memory_bytes", "Chrome memory by kind (rss, js_heap)")
+COMMANDS = metrics.counter("commands_handled_total", "Commands dispatched by name")
+THROTTLE = metrics.counter("commands_throttled_total", "Throttle decisions by result")
+
+
+async def serve_metrics(host="127.0.0.1", port=9108):
+    """Expose /metrics until cancelled; returns (the bot keeps running) if the port can't be bound"""
+    # Imported here so recording metrics (e.g. from manage_war) needs no aiohttp
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"⚠️ Metrics endpoint disabled, could not bind {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    logger.info(f"📈 Metrics at http://{host}:{port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,136 @@
+# outbound_queue.py
+import asyncio
+import time
+import logging
+from collections import deque
+from metrics import SEND_LATENCY, OUTBOUND_TOTAL
+from tracing import span, current_span
+
+logger = logging.getLogger(__name__)
+
+# Lower number = sent first
+PRIORITY_STATE = 0    # War state changes, maintenance, raid weekend
+PRIORITY_REPLY = 1    # Command replies
+PRIORITY_ATTACK = 2   # Per-attack shoutouts (coalesced)
+
+LANE_NAMES = {
+    PRIORITY_STATE: "state",
+    PRIORITY_REPLY: "reply",
+    PRIORITY_ATTACK: "attack",
+}
+
+
+class OutboundQueue:
+    """
+    Single consumer for everything the bot posts to the group chat.
+
+    Messages wait in priority lanes so a war-state announcement never queues
+    behind a burst of attack shoutouts. Attack messages that arrive within
+    coalesce_window seconds of each other go out as one combined post.
+    """
+
+    def __init__(self, send, coalesce_window=5.0, max_coalesce=10):
+        """
+        Args:
+            send: async callable taking the message text and returning success
+            coalesce_window: seconds to hold the first attack message for company
+            max_coalesce: maximum attack messages merged into one post
+        """
+        self.send = send
+        self.coalesce_window = coalesce_window
+        self.max_coalesce = max_coalesce
+        self.lanes = {priority: deque() for priority in LANE_NAMES}
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    def enqueue(self, text, priority=PRIORITY_REPLY):
+        """Queue a message for sending; never blocks"""
+        # Remember the enqueuing span so the send is traced as part of the same request
+        self.lanes[priority].append((time.monotonic(), text, current_span.get()))
+        self.ready.set()
+
+    def depth(self):
+        return {LANE_NAMES[priority]: len(lane) for priority, lane in self.lanes.items()}
+
+    def oldest_age(self):
+        """Seconds the oldest queued message has been waiting"""
+        heads = [lane[0][0] for lane in self.lanes.values() if lane]
+        return time.monotonic() - min(heads) if heads else 0.0
+
+    def is_idle(self):
+        return not any(self.lanes.values())
+
+    def stats(self):
+        return {
+            'depth': self.depth(),
+            'oldest_age': round(self.oldest_age(), 3),
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'last_latency': round(self.last_latency, 3),
+            'max_latency': round(self.max_latency, 3),
+        }
+
+    def _next_lane(self):
+        for priority in sorted(self.lanes):
+            if self.lanes[priority]:
+                return priority
+        return None
+
+    async def run(self):
+        """Consume the lanes forever, highest priority first"""
+        while True:
+            await self.ready.wait()
+            priority = self._next_lane()
+            if priority is None:
+                self.ready.clear()
+                continue
+
+            lane = self.lanes[priority]
+            if priority == PRIORITY_ATTACK:
+                # Hold the first shoutout briefly so a burst becomes one post.
+                # Any enqueue wakes the wait early so the lanes are re-checked
+                # and a more urgent message goes out without waiting the window.
+                wait = lane[0][0] + self.coalesce_window - time.monotonic()
+                if wait > 0 and len(lane) < self.max_coalesce:
+                    self.ready.clear()
+                    try:
+                        await asyncio.wait_for(self.ready.wait(), wait)
+                    except asyncio.TimeoutError:
+                        self.ready.set()  # Window over; the attack lane is still waiting
+                    continue
+                batch = [lane.popleft() for _ in range(min(len(lane), self.max_coalesce))]
+                self.coalesced += len(batch) - 1
+                OUTBOUND_TOTAL.inc(len(batch) - 1, result="coalesced")
+            else:
+                batch = [lane.popleft()]
+
+            text = "\n".join(message for _, message, _ in batch)
+            queued_at = batch[0][0]
+            logger.info(
+                f"📤 Sending {LANE_NAMES[priority]} message ({len(batch)} merged, "
+                f"waited {time.monotonic() - queued_at:.1f}s, queue depth {self.depth()})"
+            )
+
+            try:
+                with SEND_LATENCY.time(lane=LANE_NAMES[priority]), \
+                        span('send', parent=batch[0][2], lane=LANE_NAMES[priority], merged=len(batch)):
+                    success = await self.send(text)
+            except Exception as e:
+                logger.error(f"Outbound send failed: {e}")
+                success = False
+
+            latency = time.monotonic() - queued_at
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            if success:
+                self.sent += 1
+                OUTBOUND_TOTAL.inc(result="sent")
+            else:
+                self.failed += 1
+                OUTBOUND_TOTAL.inc(result="failed")
+                logger.warning(f"⚠️ Failed to deliver {LANE_NAMES[priority]} message after {latency:.1f}s")
@@ -0,0 +1,129 @@
+# session_health.py
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "c_user"  # Present only while Facebook considers us logged in
+
+
+class SessionWatchdog:
+    """
+    Tracks whether the Facebook session is still logged in, in the background.
+
+    Each check reads a few cheap signals on the browser thread: the current
+    URL (Facebook redirects to /login or a checkpoint when the session ends),
+    the expiry of the session cookie, and whether the chat composer is still
+    rendered. Re-login only happens when those signals say the session is
+    gone, so sends never pay for a verification step.
+    """
+
+    def __init__(self, messenger, interval=60, expiry_warning=86400):
+        """
+        Args:
+            messenger: FacebookMessenger whose browser and driver are watched
+            interval: seconds between checks
+            expiry_warning: warn when the session cookie expires within this many seconds
+        """
+        self.messenger = messenger
+        self.interval = interval
+        self.expiry_warning = expiry_warning
+        self.status = "unknown"
+        self.last_checked = None
+        self.cookie_expiry = None
+        self.warned_expiry = None
+        self.missing_composer = 0
+        self.relogins = 0
+        self.failed_relogins = 0
+
+    def stats(self):
+        return {
+            'status': self.status,
+            'last_checked': self.last_checked,
+            'cookie_expiry': self.cookie_expiry,
+            'relogins': self.relogins,
+            'failed_relogins': self.failed_relogins,
+        }
+
+    def check(self):
+        """Classify the session as ok, degraded, logged_out or down. Runs on the browser thread."""
+        driver = self.messenger.driver
+        if driver is None:
+            return "down"
+
+        if self.messenger.is_session_expired():
+            return "logged_out"
+
+        cookie = driver.get_cookie(SESSION_COOKIE)
+        if cookie is None:
+            return "logged_out"
+
+        self.cookie_expiry = cookie.get('expiry')
+        if self.cookie_expiry:
+            remaining = self.cookie_expiry - time.time()
+            if remaining <= 0:
+                return "logged_out"
+            if remaining < self.expiry_warning and self.warned_expiry != self.cookie_expiry:
+                self.warned_expiry = self.cookie_expiry
+                logger.warning(f"⚠️ Facebook session cookie expires in {remaining / 3600:.1f}h")
+
+        if "messages/t/" in driver.current_url and self.messenger.find_composer() is None:
+            return "degraded"
+
+        return "ok"
+
+    def recover(self, status):
+        """Bring the session back, doing no more than the status calls for. Runs on the browser thread."""
+        if status == "degraded":
+            # Composer gone but still logged in: reloading the chat is enough
+            if self.messenger.navigate_to_chat() is not None:
+                return True
+            if not self.messenger.is_session_expired():
+                return False
+
+        logger.warning(f"🔐 Session {status}, logging in again...")
+        if self.messenger.login():
+            self.relogins += 1
+            self.messenger.save_cookies()
+            return True
+
+        self.failed_relogins += 1
+        return False
+
+    async def run(self):
+        browser = self.messenger.browser
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                status = await browser.run(self.check, timeout=30)
+            except Exception as e:
+                logger.warning(f"⚠️ Session check failed: {e}")
+                continue
+
+            self.last_checked = time.time()
+            if status != self.status:
+                logger.info(f"🔐 Session status: {self.status} -> {status}")
+            self.status = status
+
+            if status == "ok":
+                self.missing_composer = 0
+                continue
+
+            if status == "degraded":
+                # A single miss is usually a re-render in progress
+                self.missing_composer += 1
+                if self.missing_composer < 2:
+                    continue
+
+            self.missing_composer = 0
+            try:
+                recovered = await browser.run(self.recover, status, timeout=120)
+            except Exception as e:
+                logger.error(f"❌ Session recovery failed: {e}")
+                recovered = False
+
+            if recovered:
+                self.status = "ok"
+                logger.info("✅ Session restored")
@@ -0,0 +1,111 @@
+# throttle.py
+import time
+import threading
+import logging
+from collections import Counter
+from metrics import THROTTLE
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows `burst` events at once, refilled at `rate` events per second"""
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class CommandThrottle:
+    """
+    Rate limits commands before they reach the dispatcher.
+
+    Every reply costs a browser send of a few seconds, so each sender and
+    each chat gets a token bucket; commands beyond it are dropped without a
+    reply. Identical read-only commands (same command and arguments, from
+    anyone) inside fold_window seconds are folded into the first one's
+    reply, since everybody in the chat sees that reply anyway.
+    """
+
+    def __init__(self, user_per_minute=6, user_burst=3, chat_per_minute=20, chat_burst=10, fold_window=30):
+        self.user_rate = user_per_minute / 60
+        self.user_burst = user_burst
+        self.chat_rate = chat_per_minute / 60
+        self.chat_burst = chat_burst
+        self.fold_window = fold_window
+        self.users = {}
+        self.chats = {}
+        self.recent = {}  # fold key -> monotonic time of the reply it folds into
+        self.lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = Counter()  # sender -> commands dropped
+        self.folded = 0
+
+    def admit(self, sender, chat="default"):
+        """Take a token for sender and for chat; False means drop the command"""
+        with self.lock:
+            now = time.monotonic()
+            user = self.users.get(sender)
+            if user is None:
+                user = self.users[sender] = TokenBucket(self.user_rate, self.user_burst, now)
+            room = self.chats.get(chat)
+            if room is None:
+                room = self.chats[chat] = TokenBucket(self.chat_rate, self.chat_burst, now)
+
+            if not user.take(now):
+                self.rejected[sender] += 1
+                THROTTLE.inc(result="rejected")
+                logger.info(f"🚦 Throttled {sender} ({self.rejected[sender]} dropped so far)")
+                return False
+            if not room.take(now):
+                self.rejected[sender] += 1
+                THROTTLE.inc(result="rejected")
+                logger.info(f"🚦 Chat {chat} over its command rate, dropped command from {sender}")
+                return False
+
+            self.allowed += 1
+            THROTTLE.inc(result="allowed")
+            self.prune(now)
+            return True
+
+    def fold(self, key):
+        """True if an identical command was answered inside the fold window"""
+        with self.lock:
+            now = time.monotonic()
+            answered = self.recent.get(key)
+            if answered is not None and now - answered < self.fold_window:
+                self.folded += 1
+                THROTTLE.inc(result="folded")
+                logger.info(f"🧺 Folded repeated command {key[0]} into the previous reply")
+                return True
+            self.recent[key] = now
+            return False
+
+    def prune(self, now):
+        """Forget idle senders and expired fold keys so memory stays flat"""
+        if len(self.users) > 256:
+            self.users = {name: bucket for name, bucket in self.users.items() if not bucket.full(now)}
+        if len(self.recent) > 256:
+            self.recent = {key: at for key, at in self.recent.items() if now - at < self.fold_window}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': sum(self.rejected.values()),
+                'folded': self.folded,
+                'top_rejected': self.rejected.most_common(5),
+            }
@@ -0,0 +1,86 @@
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import defaultdict
+
+def load_spans(path, since=None):
+    """Read the span log and its rotated backups (traces.jsonl.1, .2, ...)"""
+    files = sorted(glob.glob(f"{path}.*"), reverse=True) + [path]
+    spans = []
+    for name in files:
+        try:
+            with open(name, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written line
+                    if since is None or record.get('start', 0) >= since:
+                        spans.append(record)
+        except FileNotFoundError:
+            continue
+    return spans
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def stage_paths(spans):
+    """Name each span by its path from the root, e.g. attack_poll > diff"""
+    by_id = {span['span_id']: span for span in spans}
+    paths = {}
+
+    def path_of(span):
+        cached = paths.get(span['span_id'])
+        if cached is None:
+            parent = by_id.get(span.get('parent_id'))
+            cached = f"{path_of(parent)} > {span['name']}" if parent else span['name']
+            paths[span['span_id']] = cached
+        return cached
+
+    return {span['span_id']: path_of(span) for span in spans}
+
+def summarize(spans, by_path=False):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    paths = stage_paths(spans) if by_path else {}
+
+    for span in spans:
+        stage = paths.get(span['span_id'], span['name'])
+        durations[stage].append(span['duration_ms'])
+        if span.get('status') == 'error':
+            errors[stage] += 1
+
+    rows = []
+    for stage, values in durations.items():
+        values.sort()
+        rows.append((
+            stage, len(values), errors[stage],
+            percentile(values, 0.50), percentile(values, 0.95), percentile(values, 0.99), values[-1]
+        ))
+    return sorted(rows, key=lambda row: row[5], reverse=True)
+
+def main():
+    """Print p50/p95/p99 per traced stage from the rotating span log."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('path', nargs='?', default='traces.jsonl')
+    parser.add_argument('--since', type=float, help="only spans from the last N minutes")
+    parser.add_argument('--paths', action='store_true', help="group by full span path instead of span name")
+    args = parser.parse_args()
+
+    since = time.time() - args.since * 60 if args.since else None
+    spans = load_spans(args.path, since)
+    if not spans:
+        print(f"No spans found in {args.path}")
+        return 1
+
+    rows = summarize(spans, by_path=args.paths)
+    width = max(len(row[0]) for row in rows)
+    print(f"{'stage':<{width}}  {'count':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, count, errors, p50, p95, p99, worst in rows:
+        print(f"{stage:<{width}}  {count:>7} {errors:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {worst:>9.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# tracing.py
+import json
+import os
+import queue
+import threading
+import time
+import logging
+import logging.handlers
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# The span new spans attach to; follows asyncio tasks, to_thread and the browser actor
+current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attrs', 'start', 'started', 'status')
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.status = "ok"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'status': self.status,
+            'attrs': self.attrs,
+        }
+
+
+class OtlpExporter:
+    """Batches finished spans to a local OTLP/HTTP collector (JSON encoding) from a background thread"""
+
+    def __init__(self, endpoint="http://127.0.0.1:4318/v1/traces", service_name="coc-fb-bot", flush_interval=5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=10000)
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def export(self, record):
+        try:
+            self.pending.put_nowait(record)
+        except queue.Full:
+            pass  # Tracing must never slow the bot down
+
+    def _convert(self, record):
+        start_ns = int(record['start'] * 1e9)
+        span = {
+            'traceId': record['trace_id'],
+            'spanId': record['span_id'],
+            'name': record['name'],
+            'kind': 1,
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int(record['duration_ms'] * 1e6)),
+            'attributes': [{'key': key, 'value': {'stringValue': str(value)}} for key, value in record['attrs'].items()],
+            'status': {'code': 2 if record['status'] == 'error' else 1},
+        }
+        if record['parent_id']:
+            span['parentSpanId'] = record['parent_id']
+        return span
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            batch = []
+            while not self.pending.empty() and len(batch) < 1000:
+                batch.append(self._convert(self.pending.get_nowait()))
+            if not batch:
+                continue
+
+            body = json.dumps({'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+                'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': batch}],
+            }]}).encode()
+            request = urllib.request.Request(self.endpoint, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                logger.debug(f"OTLP export of {len(batch)} spans failed: {e}")
+
+
+class Tracer:
+    """
+    Opt-in span tracing. Finished spans are written as JSON lines to a
+    rotating file (by a background listener, so the event loop never does
+    file IO) and optionally exported to an OTLP collector. When disabled,
+    span() costs one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sink = None
+        self.listener = None
+        self.exporter = None
+
+    def configure(self, enabled, path="traces.jsonl", max_bytes=10 * 1024 * 1024, backups=5, otlp_endpoint=None):
+        self.enabled = enabled
+        if not enabled:
+            return
+
+        records = queue.Queue(-1)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.listener = logging.handlers.QueueListener(records, handler)
+        self.listener.start()
+
+        self.sink = logging.getLogger('tracing.spans')
+        self.sink.setLevel(logging.INFO)
+        self.sink.propagate = False
+        self.sink.handlers = [logging.handlers.QueueHandler(records)]
+
+        if otlp_endpoint:
+            self.exporter = OtlpExporter(otlp_endpoint)
+        logger.info(f"🔭 Tracing spans to {path}" + (f" and {otlp_endpoint}" if otlp_endpoint else ""))
+
+    @contextmanager
+    def span(self, name, parent=None, **attrs):
+        """
+        Time a block as a child of the current span (or of parent, a span
+        captured elsewhere, e.g. when the message was queued).
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        span = Span(name, parent or current_span.get(), attrs)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(span)
+
+    def finish(self, span):
+        record = span.record()
+        self.sink.info(json.dumps(record, ensure_ascii=False, default=str))
+        if self.exporter is not None:
+            self.exporter.export(record)
+
+    def shutdown(self):
+        if self.listener is not None:
+            self.listener.stop()
+
+
+tracer = Tracer()
+span = tracer.span
@@ -0,0 +1,308 @@
+# transports.py
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from aiohttp import web, ClientSession, ClientTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class Transport(ABC):
+    """
+    Where the bot's posts go and where chat commands come from.
+
+    send(text) posts one message and returns success, receive() returns the
+    new command messages as dicts with 'id', 'sender' and 'message', and
+    health() reports the transport's state. The listener sleeps poll_interval
+    seconds between receive() calls that returned nothing.
+    """
+
+    name = "transport"
+    chat_id = "default"  # Which chat commands come from, for per-chat throttling
+    poll_interval = 2.0
+
+    async def start(self):
+        return True
+
+    @abstractmethod
+    async def send(self, message):
+        """Post one message; returns True on success"""
+
+    async def receive(self):
+        return []
+
+    def health(self):
+        return {'transport': self.name, 'ok': True}
+
+    async def reset(self):
+        """Recover after repeated listener errors"""
+        pass
+
+    async def close(self):
+        pass
+
+
+def parse_console_line(line, default_sender):
+    """'Name: !cmd' -> ('Name', '!cmd'); plain '!cmd' -> (default_sender, '!cmd')"""
+    sender, sep, text = line.partition(':')
+    if sep and not sender.startswith('!') and text.strip().startswith('!'):
+        return sender.strip() or default_sender, text.strip()
+    return default_sender, line.strip()
+
+
+class InboxTransport(Transport):
+    """Base for local transports: incoming commands wait in an in-memory queue"""
+
+    poll_interval = 0.1
+
+    def __init__(self, default_sender="local"):
+        self.default_sender = default_sender
+        self.inbox = deque()
+        self.received = 0
+        self.sent = 0
+        self.next_id = 0
+
+    def push(self, sender, message):
+        """Queue one incoming message; non-commands are dropped like in the group chat"""
+        message = (message or '').strip()
+        if not message.startswith('!'):
+            return False
+        self.next_id += 1
+        self.inbox.append({
+            'id': f"{self.name}-{self.next_id}",
+            'sender': sender or self.default_sender,
+            'message': message,
+            'seen_at': time.time(),
+        })
+        self.received += 1
+        return True
+
+    async def receive(self):
+        messages = list(self.inbox)
+        self.inbox.clear()
+        return messages
+
+    def health(self):
+        return {
+            'transport': self.name,
+            'ok': True,
+            'received': self.received,
+            'sent': self.sent,
+            'inbox': len(self.inbox),
+        }
+
+
+class FacebookTransport(Transport):
+    """The Messenger group chat, driven through FacebookMessenger's browser thread"""
+
+    name = "facebook"
+    poll_interval = 2.0
+
+    def __init__(self, messenger, fb_gc_id, scrape_timeout=60):
+        self.messenger = messenger
+        self.fb_gc_id = str(fb_gc_id)
+        self.chat_id = self.fb_gc_id
+        self.scrape_timeout = scrape_timeout
+
+    async def start(self):
+        # Logs in on the thread that will own the driver and lands on the chat
+        return await self.messenger.browser.run(self.messenger.login)
+
+    async def send(self, message):
+        return await self.messenger.send(message)
+
+    async def receive(self):
+        return await self.messenger.browser.run(
+            self.messenger.get_latest_messages, self.fb_gc_id, timeout=self.scrape_timeout
+        )
+
+    async def reset(self):
+        await self.messenger.browser.run(self.messenger.refresh_chat, timeout=self.scrape_timeout)
+
+    def health(self):
+        return {
+            'transport': self.name,
+            'ok': self.messenger.driver is not None,
+            'browser_queue': self.messenger.browser.pending(),
+            'startup_seconds': self.messenger.startup_seconds,
+            'last_send': self.messenger.last_send_timings,
+        }
+
+    async def close(self):
+        await asyncio.to_thread(self.messenger.close)
+
+
+class JsonlTransport(InboxTransport):
+    """
+    Appends every post as one JSON line to outbox_path. If inbox_path is
+    given, new lines appended to it are read as commands: either JSON
+    {"sender": ..., "message": ...} or plain 'Name: !cmd' text.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, outbox_path="outbox.jsonl", inbox_path=None, default_sender="local"):
+        super().__init__(default_sender)
+        self.outbox_path = outbox_path
+        self.inbox_path = inbox_path
+        self.inbox_offset = 0
+
+    async def start(self):
+        if self.inbox_path and os.path.exists(self.inbox_path):
+            # Only commands written after startup count
+            self.inbox_offset = os.path.getsize(self.inbox_path)
+        return True
+
+    def _append(self, line):
+        with open(self.outbox_path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    def _read_new_lines(self):
+        if not self.inbox_path or not os.path.exists(self.inbox_path):
+            return []
+        with open(self.inbox_path, "rb") as file:
+            file.seek(self.inbox_offset)
+            data = file.read()
+        # Leave a partially written last line for the next poll
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self.inbox_offset += end + 1
+        return data[:end].decode("utf-8", errors="replace").splitlines()
+
+    async def send(self, message):
+        line = json.dumps({'ts': datetime.now().isoformat(), 'message': message}, ensure_ascii=False)
+        await asyncio.to_thread(self._append, line)
+        self.sent += 1
+        return True
+
+    async def receive(self):
+        for line in await asyncio.to_thread(self._read_new_lines):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                self.push(entry.get('sender'), entry.get('message'))
+            except (ValueError, AttributeError):
+                self.push(*parse_console_line(line, self.default_sender))
+        return await super().receive()
+
+
+class ConsoleTransport(InboxTransport):
+    """Prints posts to stdout and reads commands from stdin ('Name: !cmd' or '!cmd')"""
+
+    name = "console"
+
+    def __init__(self, default_sender="console"):
+        super().__init__(default_sender)
+        self.loop = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read_stdin, name="console-input", daemon=True).start()
+        print("💬 Console transport ready. Type commands like `!help` or `Name: !kudos`.")
+        return True
+
+    def _read_stdin(self):
+        for line in sys.stdin:
+            sender, message = parse_console_line(line, self.default_sender)
+            self.loop.call_soon_threadsafe(self.push, sender, message)
+
+    async def send(self, message):
+        print(f"🤖 {message}", flush=True)
+        self.sent += 1
+        return True
+
+
+class WebhookTransport(InboxTransport):
+    """
+    Local HTTP endpoint. POST /messages with {"sender", "message"} to send a
+    command; GET /outbox returns (and clears) the bot's posts, unless
+    callback_url is set, in which case each post is POSTed there as
+    {"message": ...}. GET /health returns health().
+    """
+
+    name = "webhook"
+
+    def __init__(self, host="127.0.0.1", port=8765, callback_url=None, default_sender="webhook"):
+        super().__init__(default_sender)
+        self.host = host
+        self.port = port
+        self.callback_url = callback_url
+        self.outbox = deque(maxlen=1000)
+        self.runner = None
+        self.session = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/messages", self.handle_incoming)
+        app.router.add_get("/outbox", self.handle_outbox)
+        app.router.add_get("/health", self.handle_health)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        if self.callback_url:
+            self.session = ClientSession(timeout=ClientTimeout(total=10))
+        logger.info(f"🌐 Webhook transport listening on http://{self.host}:{self.port}")
+        return True
+
+    async def handle_incoming(self, request):
+        try:
+            entry = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'expected JSON'}, status=400)
+        if not isinstance(entry, dict):
+            return web.json_response({'error': 'expected a JSON object'}, status=400)
+        accepted = self.push(entry.get('sender'), entry.get('message'))
+        return web.json_response({'accepted': accepted})
+
+    async def handle_outbox(self, request):
+        messages = list(self.outbox)
+        self.outbox.clear()
+        return web.json_response(messages)
+
+    async def handle_health(self, request):
+        return web.json_response(self.health())
+
+    async def send(self, message):
+        if self.session is None:
+            self.outbox.append({'ts': datetime.now().isoformat(), 'message': message})
+            self.sent += 1
+            return True
+        try:
+            async with self.session.post(self.callback_url, json={'message': message}) as response:
+                ok = response.status < 300
+        except Exception as e:
+            logger.error(f"Webhook delivery failed: {e}")
+            return False
+        if ok:
+            self.sent += 1
+        return ok
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+        if self.runner:
+            await self.runner.cleanup()
+
+
+def create_transport(kind, messenger=None, fb_gc_id=None, **options):
+    """Build the transport named by kind: facebook, jsonl, console or webhook"""
+    kind = (kind or "facebook").lower()
+    if kind == "facebook":
+        return FacebookTransport(messenger, fb_gc_id, **options)
+    if kind == "jsonl":
+        return JsonlTransport(**options)
+    if kind == "console":
+        return ConsoleTransport(**options)
+    if kind == "webhook":
+        return WebhookTransport(**options)
+    raise ValueError(f"Unknown transport: {kind}")
@@ -0,0 +1,265 @@
+# war_log.py
+import sqlite3
+import logging
+from metrics import DB_WRITE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = 'war_attacks.db'
+LEGACY_TABLE = 'logged_attacks'
+
+
+def connect(db_name=DB_NAME):
+    conn = sqlite3.connect(db_name)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def init_attack_log_db(db_name=DB_NAME):
+    """Create the war-scoped attack log schema and migrate the legacy table."""
+    logger.info(f"Initializing {db_name} for logging attacks...")
+    conn = connect(db_name)
+    c = conn.cursor()
+
+    # One row per war. Legacy rows have no start time, so they share ''.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS wars (
+            war_id INTEGER PRIMARY KEY,
+            opponent_clan TEXT NOT NULL,
+            start_time TEXT NOT NULL DEFAULT '',
+            team_size INTEGER,
+            UNIQUE (opponent_clan, start_time)
+        )
+    ''')
+
+    # One row per attack, keyed by (war_id, attack_order)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS attacks (
+            attack_id INTEGER PRIMARY KEY,
+            war_id INTEGER NOT NULL REFERENCES wars(war_id) ON DELETE CASCADE,
+            attack_order INTEGER NOT NULL,
+            attacker_tag TEXT NOT NULL,
+            attacker_name TEXT,
+            defender_name TEXT,
+            stars INTEGER,
+            destruction_percentage REAL NOT NULL DEFAULT 0,
+            UNIQUE (war_id, attack_order)
+        )
+    ''')
+
+    # Covering index for per-player history (no table lookups needed)
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attacks_player
+        ON attacks (attacker_tag, war_id, attack_order, stars, destruction_percentage)
+    ''')
+
+    # Covering index for per-war summaries
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attacks_war
+        ON attacks (war_id, attack_order, attacker_tag, stars, destruction_percentage)
+    ''')
+
+    conn.commit()
+    migrate_legacy_attacks(conn)
+    conn.close()
+    logger.info(f"{db_name} initialized.\n")
+
+
+def migrate_legacy_attacks(conn):
+    """Copy rows from the old logged_attacks table into wars/attacks.
+
+    The legacy table has no war identifier, so each opponent clan becomes one
+    war with an empty start time. Wars are numbered in the order the clans
+    were last fought, so the newest legacy war has the highest war_id (see
+    get_or_create_war). The old table is renamed rather than dropped, so
+    attacks that collide with an earlier one (a clan fought twice repeats its
+    attack orders) are counted in a warning and can still be found there.
+    """
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LEGACY_TABLE,))
+    if not c.fetchone():
+        return 0
+
+    c.execute(f"PRAGMA table_info({LEGACY_TABLE})")
+    columns = [col[1] for col in c.fetchall()]
+    # Older databases may be missing columns that were added by manage_war.py
+    opponent_col = "COALESCE(l.opponent_clan, '')" if 'opponent_clan' in columns else "''"
+    name_col = 'l.attacker_name' if 'attacker_name' in columns else 'NULL'
+    destruction_col = (
+        "CAST(REPLACE(COALESCE(l.destruction_percentage, '0'), '%', '') AS REAL)"
+        if 'destruction_percentage' in columns else '0'
+    )
+
+    try:
+        c.execute('BEGIN')
+        c.execute(f'''
+            INSERT OR IGNORE INTO wars (opponent_clan, start_time)
+            SELECT {opponent_col}, '' FROM {LEGACY_TABLE} l
+            GROUP BY {opponent_col}
+            ORDER BY MAX(l.rowid)
+        ''')
+        c.execute(f'''
+            INSERT OR IGNORE INTO attacks
+                (war_id, attack_order, attacker_tag, attacker_name, defender_name, destruction_percentage)
+            SELECT w.war_id, l.attack_order, l.attacker_tag, {name_col}, l.defender_name, {destruction_col}
+            FROM {LEGACY_TABLE} l
+            JOIN wars w ON w.opponent_clan = {opponent_col} AND w.start_time = ''
+        ''')
+        migrated = c.rowcount
+        c.execute(f"SELECT COUNT(*) FROM {LEGACY_TABLE}")
+        skipped = c.fetchone()[0] - migrated
+        c.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME TO {LEGACY_TABLE}_legacy")
+        conn.commit()
+        logger.info(f"Migrated {migrated} legacy attacks into the wars/attacks schema")
+        if skipped:
+            # A clan fought more than once repeats attack orders inside its single legacy war
+            logger.warning(
+                f"⚠️ {skipped} legacy attacks repeat an attack order of the same opponent and were not "
+                f"migrated; they are still in {LEGACY_TABLE}_legacy"
+            )
+        return migrated
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Failed to migrate legacy attacks: {e}")
+        return 0
+
+
+def get_or_create_war(opponent_clan, start_time='', team_size=None, conn=None):
+    """Return the war_id for (opponent_clan, start_time), creating it if needed.
+
+    Only writes when the war is new. The newest war migrated from the legacy
+    table has no start time; if it is against the same opponent it is the war
+    that was running during the upgrade, so it takes over the real start time
+    rather than a second war being created (which would re-announce its attacks).
+    """
+    opponent_clan = opponent_clan or ''
+    start_time = start_time or ''
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        c = conn.cursor()
+        c.execute('''
+            SELECT war_id FROM wars WHERE opponent_clan = ? AND start_time = ?
+        ''', (opponent_clan, start_time))
+        row = c.fetchone()
+        if row:
+            return row[0]
+
+        adopted = 0
+        if start_time:
+            c.execute('''
+                UPDATE wars SET start_time = ?, team_size = COALESCE(team_size, ?)
+                WHERE war_id = (SELECT MAX(war_id) FROM wars WHERE start_time = '')
+                  AND opponent_clan = ?
+            ''', (start_time, team_size, opponent_clan))
+            adopted = c.rowcount
+        if not adopted:
+            c.execute('''
+                INSERT OR IGNORE INTO wars (opponent_clan, start_time, team_size)
+                VALUES (?, ?, ?)
+            ''', (opponent_clan, start_time, team_size))
+        c.execute('''
+            SELECT war_id FROM wars WHERE opponent_clan = ? AND start_time = ?
+        ''', (opponent_clan, start_time))
+        war_id = c.fetchone()[0]
+        conn.commit()
+        if adopted:
+            logger.info(f"Legacy war against {opponent_clan} continues as war {war_id} ({start_time})")
+        return war_id
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def is_attack_logged(war_id, attack_order):
+    conn = connect()
+    c = conn.cursor()
+    c.execute('''
+        SELECT 1 FROM attacks
+        WHERE war_id = ? AND attack_order = ?
+    ''', (war_id, attack_order))
+    result = c.fetchone()
+    conn.close()
+    return result is not None
+
+
+def log_attack(war_id, attack_order, attacker_tag, attacker_name, defender_name, stars, destruction):
+    with DB_WRITE_LATENCY.time(op='log_attack'):
+        conn = connect()
+        c = conn.cursor()
+        c.execute('''
+            INSERT OR IGNORE INTO attacks
+                (war_id, attack_order, attacker_tag, attacker_name, defender_name, stars, destruction_percentage)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (war_id, attack_order, attacker_tag, attacker_name, defender_name, stars, destruction or 0))
+        conn.commit()
+        conn.close()
+
+
+def get_player_history(attacker_tag, limit=50):
+    """Most recent attacks by one player, served from idx_attacks_player."""
+    conn = connect()
+    c = conn.cursor()
+    c.execute('''
+        SELECT war_id, attack_order, stars, destruction_percentage
+        FROM attacks
+        WHERE attacker_tag = ?
+        ORDER BY war_id DESC, attack_order DESC
+        LIMIT ?
+    ''', (attacker_tag, limit))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def get_war_attacks(war_id):
+    """All attacks of one war in order, served from idx_attacks_war."""
+    conn = connect()
+    c = conn.cursor()
+    c.execute('''
+        SELECT attack_order, attacker_tag, stars, destruction_percentage
+        FROM attacks
+        WHERE war_id = ?
+        ORDER BY attack_order
+    ''', (war_id,))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def get_attack_table(filter_text=""):
+    """Every attack with its opponent clan, newest war first, for manage_war's table.
+
+    The attacks table can gain columns from manage_war, so they are read from
+    the schema. Returns (columns, rows); filter_text matches attacker tag or
+    name and defender name.
+    """
+    conn = connect()
+    c = conn.cursor()
+
+    # Get current columns in the table (the surrogate key is not shown)
+    c.execute("PRAGMA table_info(attacks)")
+    attack_columns = [col[1] for col in c.fetchall() if col[1] not in ('attack_id', 'war_id')]
+    columns = ['war_id', 'opponent_clan'] + attack_columns
+
+    select = ', '.join(['a.war_id', 'w.opponent_clan'] + [f'a.{col}' for col in attack_columns])
+    if filter_text:
+        query = f'''
+            SELECT {select}
+            FROM attacks a JOIN wars w ON w.war_id = a.war_id
+            WHERE a.attacker_tag LIKE ? OR a.attacker_name LIKE ? OR a.defender_name LIKE ?
+            ORDER BY a.war_id DESC, a.attack_order
+        '''
+        params = (f'%{filter_text}%', f'%{filter_text}%', f'%{filter_text}%')
+    else:
+        query = f'''
+            SELECT {select}
+            FROM attacks a JOIN wars w ON w.war_id = a.war_id
+            ORDER BY a.war_id DESC, a.attack_order
+        '''
+        params = ()
+
+    c.execute(query, params)
+    rows = c.fetchall()
+    conn.close()
+    return columns, rows